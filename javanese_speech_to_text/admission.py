@@ -0,0 +1,164 @@
+"""
+Deadline-aware admission for /transcribe.
+
+Each request carries a latency deadline. Before it is queued, the time it
+would take to finish is estimated from the audio already waiting in the
+micro-batcher and the recently measured real-time factor. A request that
+would miss its deadline is first degraded (smaller token budget, tighter
+silence trimming and optionally a faster model); if even that would be too
+late it is rejected right away with 503, instead of being answered after
+the client has given up.
+"""
+import os
+
+import metrics
+
+# Admission decisions, from cheapest to most expensive for the client
+FULL = "full"
+DEGRADED = "degraded"
+SHED = "shed"
+
+# Until degraded batches have been measured, assume they run this much faster than full ones
+DEGRADED_SPEEDUP = 2.0
+
+# Speech padding used by the VAD for degraded requests (the default keeps 0.15 s)
+DEGRADED_PAD_SECONDS = 0.05
+
+
+class OverloadedError(Exception):
+    """Raised when a request cannot finish within its deadline even when degraded."""
+
+    def __init__(self, message, decision):
+        super().__init__(message)
+        self.decision = decision
+        self.retry_after = decision.retry_after
+
+
+class Decision:
+    """Outcome of admission for one request."""
+
+    def __init__(self, mode, deadline_s, estimated_s=None, degradations=(), retry_after=None):
+        self.mode = mode
+        self.deadline_s = deadline_s
+        self.estimated_s = estimated_s
+        self.degradations = list(degradations)
+        self.retry_after = retry_after
+
+    def to_dict(self):
+        return {
+            "decision": self.mode,
+            "deadline_seconds": self.deadline_s,
+            "estimated_seconds": None if self.estimated_s is None else round(self.estimated_s, 3),
+            "degradations": self.degradations,
+        }
+
+
+class AdmissionController:
+    """
+    Decide per request whether to transcribe it normally, degrade it or shed it.
+
+    The estimate is the audio queued or running in the batcher plus the
+    request's own audio, times the recent real-time factor, divided by the
+    number of batches that run at once. Nothing is shed before the first
+    batch has been measured.
+    """
+
+    def __init__(self, batcher, deadline_s=30.0, degraded_max_new_tokens=64, degraded_model=None):
+        """
+        Args:
+            batcher: MicroBatcher the requests are queued on
+            deadline_s: Default deadline in seconds; 0 disables admission control
+            degraded_max_new_tokens: Decode budget per clip for degraded requests
+            degraded_model: Faster model (e.g. smaller or int8) used for degraded
+                requests to the default model, as a name from the model registry or a
+                model ID; None keeps the requested model
+        """
+        self.batcher = batcher
+        self.deadline_s = deadline_s
+        self.degraded_max_new_tokens = degraded_max_new_tokens
+        self.degraded_model = degraded_model
+
+    @classmethod
+    def from_env(cls, batcher):
+        """Create a controller configured from STT_DEADLINE_MS, STT_DEGRADED_MAX_NEW_TOKENS and STT_DEGRADED_MODEL."""
+        return cls(
+            batcher,
+            deadline_s=float(os.environ.get("STT_DEADLINE_MS", 30000)) / 1000.0,
+            degraded_max_new_tokens=int(os.environ.get("STT_DEGRADED_MAX_NEW_TOKENS", 64)),
+            degraded_model=os.environ.get("STT_DEGRADED_MODEL") or None,
+        )
+
+    def estimate(self, audio_seconds, model_id=None, max_new_tokens=None, real_time_factor=None):
+        """
+        Seconds until a request would finish if it were queued now.
+
+        Returns:
+            Estimated seconds, or None while there is no measurement yet
+        """
+        queue_rtf = self.batcher.real_time_factor()
+        own_rtf = real_time_factor or self.batcher.real_time_factor(model_id, max_new_tokens)
+        if queue_rtf is None or own_rtf is None:
+            return None
+        concurrency = max(1, self.batcher.concurrency)
+        waiting = self.batcher.pending_seconds() * queue_rtf / concurrency
+        return self.batcher.max_wait + waiting + audio_seconds * own_rtf
+
+    def degraded_settings(self, model_id=None):
+        """
+        Model and token budget a degraded request runs with.
+
+        Returns:
+            Tuple of (model ID or None for the batcher's default, max_new_tokens, degradations)
+        """
+        degradations = [f"max_new_tokens={self.degraded_max_new_tokens}", "trimmed_silence"]
+        if self.degraded_model and model_id is None:
+            # Resolved per request so a swap() of the fallback model is picked up;
+            # imported here so the registry's model directory is read only when a fallback is configured
+            import model_registry
+            model_id = model_registry.resolve(self.degraded_model, allow_ids=True)
+            degradations.append(f"model={model_id}")
+        return model_id, self.degraded_max_new_tokens, degradations
+
+    def decide(self, audio_seconds, deadline_s=None, elapsed_s=0.0, model_id=None):
+        """
+        Admit, degrade or shed a request.
+
+        Args:
+            audio_seconds: Length of the request's audio
+            deadline_s: The request's deadline (defaults to deadline_s); 0 disables it
+            elapsed_s: Time the request has already spent, e.g. reading and decoding the upload
+            model_id: Model the request asked for, None for the default
+
+        Returns:
+            Decision; raises OverloadedError when the request is shed
+        """
+        deadline_s = self.deadline_s if deadline_s is None else deadline_s
+        if not deadline_s or deadline_s <= 0:
+            return Decision(FULL, None)
+
+        estimated = self.estimate(audio_seconds, model_id)
+        if estimated is not None:
+            estimated += elapsed_s
+        if estimated is None or estimated <= deadline_s:
+            decision = Decision(FULL, deadline_s, estimated)
+        else:
+            degraded_model, max_new_tokens, degradations = self.degraded_settings(model_id)
+            # Unmeasured degraded settings are assumed faster by DEGRADED_SPEEDUP
+            rtf = self.batcher.real_time_factor(degraded_model, max_new_tokens)
+            if rtf is None:
+                rtf = self.batcher.real_time_factor(model_id) / DEGRADED_SPEEDUP
+            degraded = self.estimate(audio_seconds, real_time_factor=rtf) + elapsed_s
+            if degraded <= deadline_s:
+                decision = Decision(DEGRADED, deadline_s, degraded, degradations)
+            else:
+                # Retry once the queue has drained to what the deadline allows
+                retry_after = max(1, int(degraded - deadline_s + 0.999))
+                decision = Decision(SHED, deadline_s, degraded, retry_after=retry_after)
+
+        metrics.ADMISSION_DECISIONS.inc(decision=decision.mode)
+        if decision.mode == SHED:
+            raise OverloadedError(
+                f"Server is overloaded: estimated {decision.estimated_s:.1f}s exceeds the {deadline_s:.1f}s deadline",
+                decision,
+            )
+        return decision
@@ -1,91 +1,660 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import os
-import tempfile
-from app import transcribe_audio
+import hmac
+import math
+import threading
+import time
+import metrics
+import model_registry
+import profiling
+from admission import DEGRADED, DEGRADED_PAD_SECONDS, AdmissionController, Decision, FULL, OverloadedError
+from audio_io import SAMPLE_RATE, decode_audio, decode_pcm
+from batching import MAX_BATCH_SECONDS, CancelledError, MicroBatcher, QueueFullError
+from jobs import JobManager, JobQueueFullError
+from longform import transcribe_chunked, transcribe_long
+from streaming import StreamingSessions
+from transcription_cache import TranscriptionCache
+from vad import detect_speech
+from worker_pool import WorkerPool
+import numpy as np
 import base64
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Coalesces concurrent requests into batched generate calls
+batcher = MicroBatcher.from_env()
+
+# Inference worker processes, started by start_workers() when STT_WORKERS > 0
+pool = None
+
+# Results keyed by decoded audio and generation settings; identical in-flight requests share one run
+cache = TranscriptionCache.from_env()
+
+# Skip silence before inference unless STT_VAD=0
+use_vad = os.environ.get('STT_VAD', '1') != '0'
+
+# Degrades or sheds /transcribe requests that would miss their deadline (STT_DEADLINE_MS)
+admission = AdmissionController.from_env(batcher)
+
+def transcribe_job_chunks(audios, cancel_event):
+    """Transcribe one step of a background job, stopping at the next decoding step if cancelled"""
+    if pool is not None:
+        # Worker processes finish their current batch; the job stops before its next one
+        return pool.transcribe(audios, batcher.language, batcher.max_new_tokens)
+    from inference import transcribe_batch
+    entry = model_registry.get_model(batcher.model_id)
+    return transcribe_batch(entry, audios, batcher.language, batcher.max_new_tokens, cancel_event=cancel_event)
+
+# Background jobs for long recordings, with a bounded queue that favours short live clips
+jobs = JobManager(
+    transcribe_job_chunks,
+    max_queued=int(os.environ.get('STT_MAX_JOBS', 32)),
+    runners=int(os.environ.get('STT_JOB_RUNNERS', 1)),
+)
+
+# Live streaming sessions; each re-decodes only its unfinalized tail through the batcher
+streams = StreamingSessions(lambda audio: batcher.submit(audio)[0])
+
+# Liveness only needs the process to answer; readiness waits for a warm model
+readiness = {"state": "starting", "error": None, "warmup_seconds": None}
+_readiness_lock = threading.Lock()
+
+def warm_up():
+    """Load the model (or start the worker processes) and run a dummy clip through it"""
+    start = time.perf_counter()
+    try:
+        num_workers = int(os.environ.get('STT_WORKERS', 0))
+        if num_workers > 0:
+            # Workers warm up themselves; the parent only loads the weights they share
+            start_workers(num_workers)
+        else:
+            from inference import warmup
+            warmup(batcher.model_id, language=batcher.language)
+    except Exception as e:
+        readiness.update(state="failed", error=str(e))
+        return
+    readiness.update(state="ready", warmup_seconds=round(time.perf_counter() - start, 3))
+
+def start_warmup():
+    """Start warming up in the background, once; the server answers liveness probes meanwhile"""
+    with _readiness_lock:
+        if readiness["state"] != "starting":
+            return
+        readiness["state"] = "warming_up"
+    threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+
+# Gauges read when /metrics is scraped
+metrics.REGISTRY.register(metrics.Gauge(
+    'stt_queue_depth',
+    'Clips waiting for the batcher and jobs waiting to run.',
+    ['queue'],
+    callback=lambda: {('batch',): batcher.queue_depth(), ('jobs',): jobs.stats()['queued']},
+))
+metrics.REGISTRY.register(metrics.Gauge(
+    'stt_model_load_seconds',
+    'Time it took to load each model.',
+    ['model_id', 'backend'],
+    callback=lambda: {(entry.model_id, entry.backend): entry.load_seconds for entry in model_registry.loaded_models()},
+))
+metrics.REGISTRY.register(metrics.Gauge(
+    'stt_estimated_wait_seconds',
+    'Estimated time before newly queued audio starts transcribing, used for admission.',
+    callback=lambda: admission.estimate(0) or 0,
+))
+metrics.REGISTRY.register(metrics.Gauge(
+    'stt_workers_alive',
+    'Inference worker processes that are running.',
+    callback=lambda: pool.stats()['alive'] if pool else 0,
+))
+
+# Content types that carry raw PCM samples rather than an encoded container
+PCM_CONTENT_TYPES = ('audio/pcm', 'audio/x-raw', 'application/x-pcm')
+
+def read_body():
+    """
+    Read the raw request body straight into one preallocated buffer
+    
+    Avoids the intermediate copies Flask makes when buffering the body as bytes.
+    """
+    length = request.content_length
+    stream = request.stream
+    if length is None:
+        return b''.join(iter(lambda: stream.read(65536), b''))
+    
+    buffer = bytearray(length)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        chunk = stream.read(min(65536, length - received))
+        if not chunk:
+            break
+        view[received:received + len(chunk)] = chunk
+        received += len(chunk)
+    return view[:received]
+
+def read_pcm_body():
+    """
+    Decode a raw PCM request body into 16 kHz float32 samples
+    
+    Format is taken from the 'X-Sample-Rate' (default 16000), 'X-Sample-Format'
+    ('int16' default or 'float32', little-endian) and 'X-Channels' (default 1) headers.
+    Raises ValueError when a header is not a whole number.
+    """
+    def header_int(name, default):
+        value = request.headers.get(name, default)
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a whole number, got '{value}'") from None
+    
+    return decode_pcm(
+        read_body(),
+        sample_format=request.headers.get('X-Sample-Format', 'int16'),
+        channels=header_int('X-Channels', 1),
+        orig_sr=header_int('X-Sample-Rate', SAMPLE_RATE),
+        sampling_rate=SAMPLE_RATE,
+    )
+
+def is_admin():
+    """Check the request's X-Admin-Token against STT_ADMIN_TOKEN (admin endpoints are off when it is unset)"""
+    token = os.environ.get('STT_ADMIN_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+def profile_requested():
+    """True when the request asks to be profiled with ?profile=1 or an 'X-Profile: 1' header"""
+    flag = request.args.get('profile', request.headers.get('X-Profile', ''))
+    return flag.lower() in ('1', 'true', 'yes')
+
+def requested_model():
+    """
+    Model and language asked for with ?model= and ?language=
+    
+    Returns:
+    - Tuple of (model ID, or None for the server's default model; Whisper language code)
+    
+    Raises model_registry.UnknownModelError (a ValueError) for names not in STT_MODELS_DIR.
+    """
+    name = request.args.get('model')
+    model_id = model_registry.resolve(name) if name and name != 'default' else None
+    language = model_registry.normalize_language(request.args.get('language')) if request.args.get('language') else batcher.language
+    return model_id, language
+
+def requested_deadline():
+    """
+    Latency deadline in seconds from the 'X-Deadline-Ms' header or the 'deadline_ms' query parameter
+    
+    Returns None (use STT_DEADLINE_MS) when neither is given; 0 turns admission control off.
+    """
+    value = request.headers.get('X-Deadline-Ms') or request.args.get('deadline_ms')
+    if value is None:
+        return None
+    deadline_ms = float(value)
+    if not math.isfinite(deadline_ms):
+        raise ValueError("Deadline must be a finite number of milliseconds")
+    if deadline_ms < 0:
+        raise ValueError("Deadline must not be negative")
+    return deadline_ms / 1000.0
+
+def transcribe_in_request_thread(audio, cancel_event=None, model_id=None, language=None):
+    """
+    Transcribe without the batcher, cache or worker processes
+    
+    Used for profiled requests, so the trace holds exactly this request's work.
+    """
+    from inference import transcribe_batch
+    entry = model_registry.get_model(model_id or batcher.model_id)
+    language = language or batcher.language
+    
+    def transcribe_many(chunks, max_new_tokens):
+        return transcribe_batch(entry, chunks, language, max_new_tokens, cancel_event=cancel_event)
+    
+    text, segments = transcribe_long(audio, transcribe_many, segments=None if use_vad else [(0, len(audio))])
+    return {"text": text, "segments": segments}
+
+def transcribe_batched(audio, cancel_event=None, model_id=None, language=None, deadline_s=None, elapsed_s=0.0):
+    """
+    Transcribe through the cache and the micro-batcher
+    
+    Setting cancel_event (e.g. when the client disconnects) drops this request's
+    queued clips and raises CancelledError. model_id and language default to the
+    batcher's. Unless the result is already cached, the request is admitted,
+    degraded or shed (OverloadedError) by its deadline_s; elapsed_s is the time
+    it has already spent.
+    
+    Returns:
+    - Tuple of (result dict, batch size, cache status, admission Decision)
+    """
+    def cache_key(model, max_new_tokens, vad):
+        return cache.make_key(
+            audio,
+            model_id=model or batcher.model_id or model_registry.DEFAULT_MODEL_ID,
+            language=language or batcher.language,
+            max_new_tokens=max_new_tokens,
+            vad=vad,
+        )
+    
+    key = cache_key(model_id, batcher.max_new_tokens, use_vad)
+    max_new_tokens, vad_pad = None, None
+    if cache.contains(key):
+        # Cached or already being computed, so it costs the queue nothing
+        decision = Decision(FULL, None)
+    else:
+        decision = admission.decide(len(audio) / SAMPLE_RATE, deadline_s, elapsed_s, model_id)
+        if decision.mode == DEGRADED:
+            # Less decoding and less silence; the result is cached apart from full-quality ones
+            model_id, max_new_tokens, _ = admission.degraded_settings(model_id)
+            vad_pad = DEGRADED_PAD_SECONDS
+            key = cache_key(model_id, max_new_tokens, f"pad={vad_pad}")
+    
+    # Transcribe the audio together with any concurrent requests
+    batch_size = 0
+    def run():
+        nonlocal batch_size
+        start = time.perf_counter()
+        if not use_vad and vad_pad is None and len(audio) <= MAX_BATCH_SECONDS * SAMPLE_RATE:
+            text, batch_size = batcher.submit(audio, language, cancel_event=cancel_event, model_id=model_id)
+            result = {"text": text, "segments": []}
+        else:
+            # Speech running past 30 s is split into overlapping windows that are stitched back
+            # together; with VAD only speech reaches the model and silent uploads skip inference
+            def transcribe_many(chunks):
+                nonlocal batch_size
+                texts, batch_size = batcher.submit_many(chunks, language, cancel_event=cancel_event, model_id=model_id,
+                                                        max_new_tokens=max_new_tokens)
+                return texts
+            
+            if vad_pad is not None:
+                segments = detect_speech(audio, pad_s=vad_pad)
+            else:
+                segments = None if use_vad else [(0, len(audio))]
+            text, segments = transcribe_chunked(audio, transcribe_many, segments=segments)
+            result = {"text": text, "segments": segments}
+        
+        # Only work actually done counts towards throughput; cache hits are not observed
+        audio_seconds = len(audio) / SAMPLE_RATE
+        metrics.AUDIO_SECONDS.inc(audio_seconds)
+        metrics.REAL_TIME_FACTOR.observe((time.perf_counter() - start) / audio_seconds)
+        return result
+    
+    result, cache_status = cache.get_or_compute(key, run)
+    return result, batch_size, cache_status, decision
+
+def start_workers(num_workers):
+    """
+    Move inference into a pool of worker processes
+    
+    The batcher then runs one batch per worker concurrently. Each worker gets
+    STT_THREADS_PER_WORKER torch threads (default: an even share of the cores).
+    """
+    global pool
+    threads_per_worker = int(os.environ.get('STT_THREADS_PER_WORKER', 0)) or None
+    batch_timeout_s = float(os.environ.get('STT_WORKER_BATCH_TIMEOUT', 120))
+    pool = WorkerPool(num_workers, threads_per_worker=threads_per_worker, model_id=batcher.model_id,
+                      batch_timeout_s=batch_timeout_s).start()
+    batcher.runner = pool.transcribe
+    batcher.concurrency = num_workers
+    return pool
+
+def read_request_audio():
+    """
+    Decode the audio sent with a request into 16 kHz float32 samples, in memory
+    
+    Accepts:
+    - A binary request body with the encoded audio (WAV, FLAC, OGG/Opus, WebM/Opus, MP3, ...),
+      sent as application/octet-stream or its audio/* content type
+    - OR
+    - Raw PCM with Content-Type audio/pcm, described by the 'X-Sample-Rate',
+      'X-Sample-Format' (int16/float32, little-endian) and 'X-Channels' headers
+    - OR
+    - audio_file: A file upload with the audio content
+    - OR
+    - audio_base64: Base64 encoded audio data with format prefix (e.g., "data:audio/wav;base64,...")
+    
+    Returns:
+    - NumPy array (empty for an empty payload), or None if the request carries no audio
+    
+    Raises ValueError for a malformed JSON body or undecodable audio.
+    """
+    content_type = request.mimetype
+    
+    if content_type in PCM_CONTENT_TYPES:
+        # Handle raw PCM samples
+        return read_pcm_body()
+        
+    if content_type == 'application/octet-stream' or content_type.startswith('audio/') or content_type.startswith('video/'):
+        # Handle an encoded audio file sent as the request body
+        audio_data = read_body()
+        
+    elif 'audio_file' in request.files:
+        # Handle file upload
+        audio_data = request.files['audio_file'].read()
+        
+    elif request.is_json:
+        # Handle base64 encoded audio; an empty or invalid JSON body is a client error, not a 500
+        payload = request.get_json(silent=True) or {}
+        audio_base64 = payload.get('audio_base64') if isinstance(payload, dict) else None
+        if not isinstance(audio_base64, str):
+            raise ValueError("Malformed JSON body: expected an object with an 'audio_base64' string")
+        
+        # Remove data URL prefix if present (e.g., "data:audio/wav;base64,")
+        if ',' in audio_base64:
+            audio_base64 = audio_base64.split(',', 1)[1]
+        
+        # Decode base64 data
+        audio_data = base64.b64decode(audio_base64)
+    else:
+        return None
+    
+    if len(audio_data) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return decode_audio(audio_data, SAMPLE_RATE)
+
+@app.before_request
+def start_request_timer():
+    # Servers that import this module (rather than running it) warm up on their first request or probe
+    if readiness["state"] == "starting":
+        start_warmup()
+    g.request_start = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+
+@app.after_request
+def observe_request(response):
+    if 'request_start' in g:
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - g.request_start,
+            endpoint=request.endpoint or 'unknown',
+            status=str(response.status_code),
+        )
+    return response
+
+@app.teardown_request
+def end_request(error=None):
+    if 'request_start' in g:
+        metrics.IN_FLIGHT.dec()
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus metrics in the text exposition format"""
+    return app.response_class(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Simple health check endpoint"""
-    return jsonify({"status": "ok", "message": "Javanese Speech-to-Text API is running"})
+    """Simple health check endpoint; also reports whether the model is warm"""
+    return jsonify({
+        "status": "ok",
+        "message": "Javanese Speech-to-Text API is running",
+        "ready": readiness["state"] == "ready",
+        "state": readiness["state"]
+    })
+
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the process is up and answering"""
+    return jsonify({"status": "ok"})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_probe():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before that or if loading failed"""
+    body = dict(readiness, status="ready" if readiness["state"] == "ready" else "not_ready")
+    return jsonify(body), 200 if readiness["state"] == "ready" else 503
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Batching and cache statistics"""
+    return jsonify({
+        "batching": batcher.stats(),
+        "cache": cache.stats(),
+        "workers": pool.stats() if pool else None,
+        "jobs": jobs.stats()
+    })
+
+@app.route('/models', methods=['GET'])
+def list_models():
+    """Models that can be requested by name, and the models currently loaded"""
+    return jsonify({
+        "default": model_registry.DEFAULT_MODEL_ID,
+        "default_language": batcher.language,
+        "available": model_registry.available_models(),
+        "loaded": [
+            {"model_id": entry.model_id, "backend": entry.backend, "memory_bytes": entry.memory_bytes}
+            for entry in model_registry.loaded_models()
+        ],
+        "memory_budget_mb": model_registry.MEMORY_BUDGET_MB or None
+    })
+
+@app.route('/models/<name>/swap', methods=['POST'])
+def swap_model(name):
+    """
+    Serve a model name from a new checkpoint version (admin only, X-Admin-Token)
+    
+    Loads and warms up the newest version in STT_MODELS_DIR/<name>, or the one
+    given with ?version=, while the current version keeps serving; requests
+    already running finish on the old version.
+    """
+    if not is_admin():
+        return jsonify({"success": False, "error": "Swapping models requires a valid X-Admin-Token header"}), 403
+    try:
+        entry = model_registry.swap(name, request.args.get('version'))
+    except model_registry.UnknownModelError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({"success": True, "model": name, "model_id": entry.model_id, "load_seconds": round(entry.load_seconds, 3)})
 
 @app.route('/transcribe', methods=['POST'])
 def transcribe():
     """
     Endpoint to transcribe Javanese audio to text
     
-    Accepts:
-    - audio_file: A file upload with the audio content
-    - OR
-    - audio_base64: Base64 encoded audio data with format prefix (e.g., "data:audio/wav;base64,...")
+    Accepts the audio in any of the formats described in read_request_audio().
+    Add ?model=<name> to use a model from STT_MODELS_DIR (see /models) and
+    ?language=<code> to override the language (default STT_LANGUAGE or 'jw').
+    
+    The request's latency deadline is 'X-Deadline-Ms' or ?deadline_ms= (default
+    STT_DEADLINE_MS). A request that would miss it under the current load is
+    degraded, or rejected with 503 and Retry-After if even that is too slow.
+    
+    Admins (X-Admin-Token) can add ?profile=1 or 'X-Profile: 1' to run the
+    request under torch.profiler; STT_PROFILE_SAMPLE_RATE profiles a fraction
+    of all requests. Profiled requests bypass the batcher and cache.
     
     Returns:
     - JSON with transcription result
     """
+    explicit_profile = profile_requested()
+    if explicit_profile and not is_admin():
+        return jsonify({"success": False, "error": "Profiling requires a valid X-Admin-Token header"}), 403
+    
+    # Passed in by the ASGI server (asgi.py) and set when the client disconnects or the request times out
+    cancel_event = request.environ.get('stt.cancel_event')
+    
     try:
-        temp_file = None
-        
-        if 'audio_file' in request.files:
-            # Handle file upload
-            audio_file = request.files['audio_file']
-            
-            # Create a temporary file
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-            temp_file.close()
-            
-            # Save the uploaded file
-            audio_file.save(temp_file.name)
-            audio_path = temp_file.name
-            
-        elif 'audio_base64' in request.json:
-            # Handle base64 encoded audio
-            audio_base64 = request.json['audio_base64']
-            
-            # Remove data URL prefix if present (e.g., "data:audio/wav;base64,")
-            if ',' in audio_base64:
-                audio_base64 = audio_base64.split(',', 1)[1]
-            
-            # Decode base64 data
-            audio_data = base64.b64decode(audio_base64)
+        model_id, language = requested_model()
+        deadline_s = requested_deadline()
+        with profiling.maybe_profile('transcribe', enabled=True if explicit_profile else None) as profile:
+            decode_start = time.perf_counter()
+            with profiling.stage('decode'):
+                audio = read_request_audio()
+            if audio is None:
+                return jsonify({"success": False, "error": "No audio data provided. Send an audio request body, 'audio_file' or 'audio_base64'"}), 400
+            if len(audio) == 0:
+                return jsonify({"success": False, "error": "Empty audio payload"}), 400
             
-            # Create a temporary file
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-            temp_file.close()
-            
-            # Write the decoded data to the file
-            with open(temp_file.name, 'wb') as f:
-                f.write(audio_data)
-            
-            audio_path = temp_file.name
-        else:
-            return jsonify({"error": "No audio data provided. Send either 'audio_file' or 'audio_base64'"}), 400
+            inference_start = time.perf_counter()
+            if profile is not None and not profile.skipped:
+                result, batch_size, cache_status = transcribe_in_request_thread(audio, cancel_event, model_id, language), 1, "bypass"
+                decision = Decision(FULL, None)
+            else:
+                result, batch_size, cache_status, decision = transcribe_batched(
+                    audio, cancel_event, model_id, language, deadline_s, inference_start - g.request_start
+                )
+            inference_end = time.perf_counter()
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - g.request_start, stage="total")
         
-        # Transcribe the audio
-        transcription = transcribe_audio(audio_path)
+        response = {
+            "success": True,
+            "transcription": result["text"],
+            "segments": result["segments"],
+            "batch_size": batch_size,
+            "cache": cache_status,
+            "model": request.args.get('model') or "default",
+            "language": language,
+            "decode_seconds": round(inference_start - decode_start, 4),
+            "inference_seconds": round(inference_end - inference_start, 4),
+            "admission": decision.to_dict()
+        }
+        if explicit_profile:
+            response["profile"] = profile.to_dict()
+        return jsonify(response)
         
-        # Clean up the temporary file
-        if temp_file:
-            os.unlink(temp_file.name)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
         
+    except QueueFullError as e:
         return jsonify({
-            "success": True,
-            "transcription": transcription
+            "success": False,
+            "error": str(e)
+        }), 503
+        
+    except OverloadedError as e:
+        # Answering after the deadline would be useless; tell the client when to come back
+        response = jsonify({
+            "success": False,
+            "error": str(e),
+            "retry_after": e.retry_after,
+            "admission": e.decision.to_dict()
         })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
         
-    except Exception as e:
-        # Clean up the temporary file in case of error
-        if temp_file and os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
+    except CancelledError as e:
+        # Client closed request; nobody reads this response
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 499
         
+    except Exception as e:
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Queue audio for background transcription
+    
+    Accepts the audio in any of the formats described in read_request_audio().
+    The optional 'priority' query parameter is 'live' or 'bulk'; by default clips
+    of up to 30 seconds are live and run before bulk uploads.
+    
+    Returns:
+    - 202 with the job ID, or 429 with a Retry-After header when the queue is full
+    """
+    try:
+        audio = read_request_audio()
+        if audio is None:
+            return jsonify({"success": False, "error": "No audio data provided. Send an audio request body, 'audio_file' or 'audio_base64'"}), 400
+        if len(audio) == 0:
+            return jsonify({"success": False, "error": "Empty audio payload"}), 400
+        
+        job = jobs.submit(audio, priority=request.args.get('priority'))
+    except JobQueueFullError as e:
+        response = jsonify({"success": False, "error": str(e), "retry_after": e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    
+    response = jsonify(dict(job.to_dict(), success=True))
+    response.headers['Location'] = f"/jobs/{job.id}"
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status, progress and the segments transcribed so far of a job"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown or expired job"}), 404
+    return jsonify(dict(job.to_dict(), success=True))
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown or expired job"}), 404
+    return jsonify(dict(job.to_dict(), success=True))
+
+@app.route('/stream', methods=['POST'])
+def start_stream():
+    """Open a streaming transcription session"""
+    session_id = streams.create()
+    return jsonify({
+        "success": True,
+        "session_id": session_id,
+        "sample_rate": SAMPLE_RATE
+    })
+
+@app.route('/stream/<session_id>', methods=['POST'])
+def push_stream(session_id):
+    """
+    Append audio frames to a streaming session
+    
+    Accepts raw PCM in the request body, described by the 'X-Sample-Rate',
+    'X-Sample-Format' and 'X-Channels' headers (16 kHz mono int16 by default).
+    
+    Returns:
+    - JSON with newly finalized segments and the current partial transcription
+    """
+    session = streams.get(session_id)
+    if session is None:
+        return jsonify({"success": False, "error": "Unknown or expired stream"}), 404
+    
+    try:
+        result = session.push(read_pcm_body())
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except QueueFullError as e:
+        return jsonify({"success": False, "error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    
+    return jsonify(dict(result, success=True))
+
+@app.route('/stream/<session_id>', methods=['DELETE'])
+def end_stream(session_id):
+    """Finalize a streaming session and return all of its segments"""
+    session = streams.pop(session_id)
+    if session is None:
+        return jsonify({"success": False, "error": "Unknown or expired stream"}), 404
+    
+    try:
+        result = session.finish()
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+    
+    return jsonify({
+        "success": True,
+        "transcription": result["text"],
+        "segments": session.segments
+    })
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
+    
+    # Load and warm up the model in the background at startup, so the server answers
+    # liveness probes right away and reports ready once the first request will be fast.
+    # With debug=True the reloader runs this file twice; only warm up in the serving process.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warmup()
+    
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
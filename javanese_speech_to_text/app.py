@@ -1,61 +1,10 @@
-import torch
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
-import soundfile as sf
+import logging
 import sys
-import sounddevice as sd
-import numpy as np
-import tempfile
-import os
-import time
+from audio_io import SAMPLE_RATE
+# transcribe_audio lives in the headless inference core; re-exported here for existing callers
+from inference import transcribe_audio
 
-def transcribe_audio(audio_path):
-    """
-    Transcribe Javanese audio to text using the whisper-tiny-javanese model.
-    
-    Args:
-        audio_path: Path to the audio file to transcribe
-    
-    Returns:
-        Transcribed text
-    """
-    # Check if CUDA is available
-    device = "cuda:0" if torch.cuda.is_available() else "cpu"
-    torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-    
-    # Model ID on Hugging Face
-    model_id = "bagasshw/whisper-tiny-javanese-openslr-v3"
-    
-    # Load model and processor
-    model = AutoModelForSpeechSeq2Seq.from_pretrained(
-        model_id, 
-        torch_dtype=torch_dtype,
-        low_cpu_mem_usage=True,
-        use_safetensors=True
-    )
-    model.to(device)
-    
-    processor = AutoProcessor.from_pretrained(model_id)
-    
-    # Create pipeline
-    pipe = pipeline(
-        "automatic-speech-recognition",
-        model=model,
-        tokenizer=processor.tokenizer,
-        feature_extractor=processor.feature_extractor,
-        max_new_tokens=128,
-        chunk_length_s=30,
-        batch_size=16,
-        return_timestamps=False,
-        torch_dtype=torch_dtype,
-        device=device,
-    )
-    
-    # Perform transcription
-    result = pipe(audio_path, generate_kwargs={"language": "jw"})
-    
-    return result["text"]
-
-def record_audio(duration=5, sample_rate=16000):
+def record_audio(duration=5, sample_rate=SAMPLE_RATE):
     """
     Record audio from the microphone for a specified duration.
     
@@ -64,8 +13,11 @@ def record_audio(duration=5, sample_rate=16000):
         sample_rate: Audio sample rate
     
     Returns:
-        Path to the recorded audio file
+        Recorded audio as a 1-D float32 NumPy array
     """
+    # Imported here so batch mode and other headless uses don't need PortAudio
+    import sounddevice as sd
+    
     # Audio recording parameters
     channels = 1
     
@@ -77,16 +29,18 @@ def record_audio(duration=5, sample_rate=16000):
     
     print("Recording finished")
     
-    # Create a temporary file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-    temp_file.close()
-    
-    # Save the recorded audio to the temporary file
-    sf.write(temp_file.name, recording, sample_rate)
-    
-    return temp_file.name
+    return recording[:, 0]
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        # Offline mode: python app.py batch <dir|manifest> [options]
+        from batch_transcribe import main
+        sys.exit(main(sys.argv[2:]))
+
+    # Show where STT_PROFILE_SAMPLE_RATE traces are written
+    logging.basicConfig(format="%(message)s")
+    logging.getLogger("inference").setLevel(logging.INFO)
+    
     try:
         # Check if duration is provided as argument
         duration = 5  # default duration
@@ -101,18 +55,15 @@ if __name__ == "__main__":
         input()
         
         # Record audio
-        audio_path = record_audio(duration=duration)
+        recording = record_audio(duration=duration)
         
         print("Processing the audio...")
         # Transcribe the recorded audio
-        transcription = transcribe_audio(audio_path)
+        transcription = transcribe_audio(recording)
         
         print("\nTranscription:")
         print(transcription)
         
-        # Clean up the temporary file
-        os.unlink(audio_path)
-        
     except KeyboardInterrupt:
         print("\nRecording cancelled.")
     except Exception as e:
@@ -0,0 +1,208 @@
+"""
+ASGI serving mode for the API.
+
+Serves the same routes as api.py, but request bodies and responses are read
+and written on an event loop, so slow uploads and downloads do not hold a
+thread. A request is handed to the Flask app in a thread only once its body
+has arrived: audio uploads (POST) run on a bounded inference executor with a
+per-request timeout, everything else on a small control executor.
+
+When a client disconnects or its request times out, the request's cancel
+event is set: clips still waiting in the batcher are dropped, and a generate
+call whose clips have all been abandoned stops at its next decoding step.
+
+Needs pip install uvicorn. Run with python asgi.py, or
+uvicorn asgi:app --host 0.0.0.0 --port 5000 (one process: the model lives in it).
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import api
+import metrics
+
+# Threads running audio uploads; most of their time is spent waiting for a batch
+INFERENCE_THREADS = int(os.environ.get("STT_ASGI_INFERENCE_THREADS", 16))
+
+# Uploads allowed to wait for an inference thread before new ones get 503
+MAX_PENDING = int(os.environ.get("STT_ASGI_MAX_PENDING", 64))
+
+# Seconds an upload may take before it is cancelled and answered with 504
+REQUEST_TIMEOUT = float(os.environ.get("STT_REQUEST_TIMEOUT", 120))
+
+_inference_executor = ThreadPoolExecutor(INFERENCE_THREADS, thread_name_prefix="asgi-inference")
+_control_executor = ThreadPoolExecutor(4, thread_name_prefix="asgi-control")
+
+# Uploads running or waiting on the inference executor; only touched on the event loop
+_admitted = 0
+
+
+def _environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope whose body has been read."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin-1"), value.decode("latin-1")
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+        elif name != "content-length":
+            key = "HTTP_" + name.upper().replace("-", "_")
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _call_flask(environ):
+    """Run one request through the Flask app; returns (status, headers, body)."""
+    # Abandoned while waiting for a thread: nothing to do
+    if environ["stt.cancel_event"].is_set():
+        return 499, [], b""
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = headers
+
+    chunks = api.app(environ, start_response)
+    try:
+        body = b"".join(chunks)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    return response["status"], response["headers"], body
+
+
+async def _read_body(receive):
+    """The full request body, or None if the client disconnected while sending it."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _send(send, status, headers, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status, payload):
+    await _send(send, status, [("Content-Type", "application/json")], json.dumps(payload).encode("utf-8"))
+
+
+def _release():
+    global _admitted
+    _admitted -= 1
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Liveness answers at once; /health/ready turns 200 when the model is warm
+            api.start_warmup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _inference_executor.shutdown(wait=False, cancel_futures=True)
+            _control_executor.shutdown(wait=False, cancel_futures=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    global _admitted
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    body = await _read_body(receive)
+    if body is None:
+        return
+
+    cancel_event = threading.Event()
+    environ = _environ(scope, body)
+    environ["stt.cancel_event"] = cancel_event
+
+    # Uploads carry audio to decode and transcribe; they are bounded and time out
+    inference = scope["method"] == "POST"
+    if inference:
+        if _admitted >= INFERENCE_THREADS + MAX_PENDING:
+            await _send_json(send, 503, {"success": False, "error": "Server is busy, too many requests waiting"})
+            return
+        _admitted += 1
+
+    loop = asyncio.get_running_loop()
+    future = (_inference_executor if inference else _control_executor).submit(_call_flask, environ)
+    if inference:
+        # Released when the thread is really done (or the request never started), not when the client goes
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(_release))
+
+    work = asyncio.wrap_future(future)
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        done, _ = await asyncio.wait(
+            {work, disconnect}, timeout=REQUEST_TIMEOUT if inference else None, return_when=asyncio.FIRST_COMPLETED
+        )
+        if work in done:
+            await _send(send, *work.result())
+            return
+
+        # Stop the request's queued clips and, if nobody else shares its batch, the generate call
+        cancel_event.set()
+        future.cancel()
+        if disconnect in done:
+            metrics.CANCELLED_REQUESTS.inc(reason="disconnect")
+        else:
+            metrics.CANCELLED_REQUESTS.inc(reason="timeout")
+            await _send_json(send, 504, {
+                "success": False,
+                "error": f"Transcription did not finish within {REQUEST_TIMEOUT:g} seconds",
+            })
+    finally:
+        disconnect.cancel()
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("ASGI serving mode needs uvicorn: pip install uvicorn")
+
+    port = int(os.environ.get("PORT", 5000))
+    uvicorn.run(app, host="0.0.0.0", port=port)
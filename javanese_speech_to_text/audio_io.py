@@ -0,0 +1,209 @@
+import io
+import os
+import time
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import soundfile as sf
+
+from metrics import DECODE_SECONDS, STAGE_SECONDS
+
+# Sample rate expected by the Whisper feature extractor
+SAMPLE_RATE = 16000
+
+# Resampling filter: zero crossings of the windowed sinc on each side, Kaiser
+# window shape and cutoff as a fraction of the lower Nyquist frequency
+RESAMPLE_ZERO_CROSSINGS = 16
+RESAMPLE_KAISER_BETA = 8.6
+RESAMPLE_ROLLOFF = 0.945
+
+# Filter phases kept per rate pair; ratios needing more are rounded to the nearest phase
+RESAMPLE_MAX_PHASES = 1024
+
+# Containers libsndfile reads in-process; everything else goes straight to ffmpeg
+SOUNDFILE_MAGIC = (b"RIFF", b"RIFX", b"RF64", b"fLaC", b"OggS", b"FORM")
+
+
+def to_mono(audio):
+    """Convert a (samples,) or (samples, channels) array to mono float32."""
+    audio = np.asarray(audio, dtype=np.float32)
+    if audio.ndim == 2:
+        audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+    return audio
+
+
+@lru_cache(maxsize=16)
+def _resample_filter(orig_sr, target_sr):
+    """
+    Polyphase Kaiser-windowed sinc filter bank for one rate pair.
+
+    Returns:
+        Tuple of (float32 bank of shape (phases, taps), phases, offset of
+        the first tap relative to the input sample before each output)
+    """
+    ratio = gcd(orig_sr, target_sr)
+    up = target_sr // ratio
+    phases = min(up, RESAMPLE_MAX_PHASES)
+
+    # Cutoff in cycles per input sample; downsampling also has to remove what would alias
+    cutoff = 0.5 * RESAMPLE_ROLLOFF * min(1.0, target_sr / orig_sr)
+    half_width = int(np.ceil(RESAMPLE_ZERO_CROSSINGS / (2 * cutoff)))
+    taps = np.arange(-half_width + 1, half_width + 1)
+
+    # Distance in input samples from each output position to each tap
+    distance = np.arange(phases)[:, None] / phases - taps[None, :]
+    window = np.i0(RESAMPLE_KAISER_BETA * np.sqrt(np.clip(1 - (distance / half_width) ** 2, 0, None)))
+    bank = 2 * cutoff * np.sinc(2 * cutoff * distance) * window / np.i0(RESAMPLE_KAISER_BETA)
+    # Unity gain at DC for every phase
+    bank /= bank.sum(axis=1, keepdims=True)
+    return bank.astype(np.float32), phases, -half_width + 1
+
+
+def resample(audio, orig_sr, target_sr=SAMPLE_RATE):
+    """
+    Resample a mono float32 array with a polyphase windowed-sinc filter.
+
+    The filter bank is built once per rate pair. Outputs that share a filter
+    phase read input windows a fixed stride apart, so each phase is a single
+    matrix-vector product over a strided view of the input, without copying it.
+    """
+    if orig_sr == target_sr or len(audio) == 0:
+        return audio
+    with STAGE_SECONDS.time(stage="resample"):
+        bank, phases, first_tap = _resample_filter(int(orig_sr), int(target_sr))
+        ratio = gcd(int(orig_sr), int(target_sr))
+        up, down = int(target_sr) // ratio, int(orig_sr) // ratio
+
+        # Zeros before the first and after the last sample, so every output sees a full set of taps
+        taps = bank.shape[1]
+        padded = np.zeros(len(audio) + taps + down // up + 1, dtype=np.float32)
+        padded[-first_tap:len(audio) - first_tap] = audio
+        windows = sliding_window_view(padded, taps)
+
+        n_out = int(round(len(audio) * target_sr / orig_sr))
+        out = np.empty(n_out, dtype=np.float32)
+        for first in range(min(up, n_out)):
+            # Output n sits at input position n * down / up; outputs first, first + up, ...
+            # share its phase and start down input samples apart
+            base, offset = divmod(first * down, up)
+            out[first::up] = windows[base::down][:len(out[first::up])] @ bank[offset * phases // up]
+        return out
+
+
+def _read_soundfile(data, sampling_rate):
+    """
+    Decode with libsndfile; mono input at the target rate is read straight into the result.
+
+    Returns:
+        Tuple of (mono float32 array, its sample rate, decoder name)
+    """
+    with sf.SoundFile(io.BytesIO(data)) as f:
+        if f.channels == 1 and f.samplerate == sampling_rate:
+            return f.read(dtype="float32"), f.samplerate, "wav" if f.format == "WAV" else "soundfile"
+        return to_mono(f.read(dtype="float32", always_2d=True)), f.samplerate, "soundfile"
+
+
+def decode_audio(data, sampling_rate=SAMPLE_RATE):
+    """
+    Decode an encoded audio payload held in memory.
+
+    WAV, FLAC and OGG are decoded in-process with soundfile, and 16 kHz mono
+    needs no further work. Anything else (WebM/Opus from browsers, MP3, AAC,
+    ...) goes to the ffmpeg decoder pool (decoder_pool.py), which resamples
+    while decoding. Nothing is written to disk.
+
+    Args:
+        data: Encoded audio bytes
+        sampling_rate: Sample rate of the returned audio
+
+    Returns:
+        1-D float32 NumPy array
+    """
+    start = time.perf_counter()
+    audio = None
+    if bytes(data[:4]) in SOUNDFILE_MAGIC:
+        try:
+            audio, sr, decoder = _read_soundfile(data, sampling_rate)
+        except RuntimeError:
+            # e.g. Opus in Ogg on an older libsndfile
+            pass
+    if audio is None:
+        from decoder_pool import get_pool
+        audio, sr, decoder = get_pool().decode(data, sampling_rate), sampling_rate, "ffmpeg"
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="decode")
+    audio = resample(audio, sr, sampling_rate)
+    DECODE_SECONDS.observe(time.perf_counter() - start, decoder=decoder)
+    return audio
+
+
+# Raw PCM sample formats accepted over the wire (little-endian)
+PCM_DTYPES = {
+    "int16": np.dtype("<i2"),
+    "float32": np.dtype("<f4"),
+}
+
+
+def decode_pcm(data, sample_format="int16", channels=1, orig_sr=SAMPLE_RATE, sampling_rate=SAMPLE_RATE):
+    """
+    Interpret raw interleaved little-endian PCM as a mono float32 array.
+
+    The buffer is viewed in place with np.frombuffer, so mono float32 at the
+    target rate is returned without copying.
+
+    Args:
+        data: bytes, bytearray or memoryview holding the samples
+        sample_format: "int16" or "float32"
+        channels: Number of interleaved channels
+        orig_sr: Sample rate of the data
+        sampling_rate: Sample rate of the returned audio
+
+    Returns:
+        1-D float32 NumPy array
+    """
+    if sample_format not in PCM_DTYPES:
+        raise ValueError(f"Unsupported sample format '{sample_format}'. Use one of: {', '.join(PCM_DTYPES)}")
+    dtype = PCM_DTYPES[sample_format]
+    if channels < 1:
+        raise ValueError("Channel count must be positive")
+    if orig_sr <= 0:
+        raise ValueError("Sample rate must be positive")
+    if len(data) % (dtype.itemsize * channels):
+        raise ValueError("PCM data length is not a whole number of frames")
+
+    start = time.perf_counter()
+    audio = np.frombuffer(data, dtype=dtype)
+    if dtype.kind == "i":
+        audio = audio.astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels)
+    audio = to_mono(audio)
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage="decode")
+    audio = resample(audio, orig_sr, sampling_rate)
+    DECODE_SECONDS.observe(time.perf_counter() - start, decoder="pcm")
+    return audio
+
+
+def load_audio(source, sampling_rate=SAMPLE_RATE):
+    """
+    Turn a path, encoded bytes or a sample array into a mono float32 array.
+
+    Args:
+        source: File path, encoded audio bytes, or a NumPy array already at sampling_rate
+        sampling_rate: Sample rate of the returned audio
+
+    Returns:
+        1-D float32 NumPy array
+    """
+    if isinstance(source, np.ndarray):
+        return to_mono(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            source = f.read()
+    return decode_audio(source, sampling_rate)
+
+
+def pipeline_input(audio, sampling_rate=SAMPLE_RATE):
+    """Wrap a sample array in the dict form the ASR pipeline accepts without touching disk."""
+    return {"raw": to_mono(audio), "sampling_rate": sampling_rate}
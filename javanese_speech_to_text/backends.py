@@ -0,0 +1,110 @@
+import os
+import warnings
+
+import torch
+from transformers.modeling_outputs import BaseModelOutput
+
+# Inference backends selectable with STT_BACKEND or the backend argument of the model registry
+BACKENDS = ("eager", "int8", "compile", "torchscript", "onnx")
+
+DEFAULT_BACKEND = os.environ.get("STT_BACKEND", "eager")
+
+
+class TracedEncoder(torch.nn.Module):
+    """
+    Drop-in replacement for the Whisper encoder backed by a TorchScript trace.
+
+    generate() still reads the convolution strides from the encoder, so the
+    original conv layers are kept as attributes.
+    """
+
+    def __init__(self, encoder, example_features):
+        super().__init__()
+        self.config = encoder.config
+        self.main_input_name = getattr(encoder, "main_input_name", "input_features")
+        self.conv1 = encoder.conv1
+        self.conv2 = encoder.conv2
+
+        class _Forward(torch.nn.Module):
+            def __init__(self, encoder):
+                super().__init__()
+                self.encoder = encoder
+
+            def forward(self, input_features):
+                return self.encoder(input_features, return_dict=False)[0]
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.traced = torch.jit.trace(_Forward(encoder).eval(), example_features)
+
+    def forward(self, input_features, attention_mask=None, head_mask=None, output_attentions=None,
+                output_hidden_states=None, return_dict=None, **kwargs):
+        hidden_states = self.traced(input_features)
+        if return_dict is False:
+            return (hidden_states,)
+        return BaseModelOutput(last_hidden_state=hidden_states)
+
+
+def apply_backend(model, backend):
+    """
+    Convert a loaded float model for the given inference backend.
+
+    Args:
+        model: WhisperForConditionalGeneration in eval mode
+        backend: "eager" (unchanged), "int8" (dynamic int8 quantization of Linear
+            layers, CPU only), "compile" (torch.compile of the encoder) or
+            "torchscript" (traced encoder)
+
+    Returns:
+        The model to use for inference
+    """
+    if backend == "eager":
+        return model
+
+    if backend == "int8":
+        device = next(model.parameters()).device
+        if device.type != "cpu":
+            raise ValueError("The int8 backend only runs on CPU")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    encoder = model.get_encoder()
+    parameter = next(encoder.parameters())
+    n_mels = model.config.num_mel_bins
+    n_frames = 2 * model.config.max_source_positions
+    example = torch.zeros(1, n_mels, n_frames, dtype=parameter.dtype, device=parameter.device)
+
+    if backend == "compile":
+        # The encoder always sees fixed 30 second windows, but batches come in any size.
+        # Marking the batch dimension dynamic keeps one graph for all sizes above 1
+        # (size 1 is always specialised) instead of recompiling for each new size;
+        # the decoder's shapes change every step and stays in eager mode.
+        compiled = torch.compile(encoder.forward)
+
+        def forward(input_features, *args, **kwargs):
+            if input_features.shape[0] > 1:
+                torch._dynamo.mark_dynamic(input_features, 0)
+            return compiled(input_features, *args, **kwargs)
+
+        encoder.forward = forward
+        return model
+
+    if backend == "torchscript":
+        model.model.encoder = TracedEncoder(encoder, example)
+        return model
+
+    raise ValueError(f"Unknown backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+
+
+def load_onnx_model(model_id):
+    """
+    Export (or load an exported) encoder/decoder pair and run it on ONNX Runtime.
+
+    Requires the optional optimum[onnxruntime] package.
+    """
+    try:
+        from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+    except ImportError:
+        raise ImportError("The onnx backend needs optimum with ONNX Runtime: pip install optimum[onnxruntime]") from None
+    return ORTModelForSpeechSeq2Seq.from_pretrained(model_id, export=not os.path.isfile(os.path.join(model_id, "encoder_model.onnx")))
@@ -0,0 +1,357 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import model_registry
+import profiling
+from audio_io import SAMPLE_RATE, load_audio
+from inference import transcribe_batch
+from longform import group_segments, plan_chunks, token_budget
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3", ".webm", ".m4a", ".opus")
+
+# Upper edges (seconds) of the length buckets speech chunks are grouped into
+BUCKET_EDGES = (5, 10, 20, 30)
+
+
+def find_inputs(source):
+    """
+    List the audio files to transcribe.
+
+    Args:
+        source: A directory (searched recursively), or a manifest file with one
+            path per line or JSON lines with a "path" field; relative paths are
+            resolved against the manifest's directory
+
+    Returns:
+        List of file paths
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(root, name)
+            for root, _, files in os.walk(source)
+            for name in files
+            if name.lower().endswith(AUDIO_EXTENSIONS)
+        )
+
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            paths.append(path if os.path.isabs(path) else os.path.join(base, path))
+    return paths
+
+
+def load_completed(output_path):
+    """Paths already transcribed successfully in an existing output file."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["path"])
+    return completed
+
+
+class BatchError(Exception):
+    """Wraps an inference error together with the batch it happened in."""
+
+    def __init__(self, batch):
+        super().__init__("Batch transcription failed")
+        self.batch = batch
+
+
+def decode_file(path):
+    """Decode and resample one file and split its speech into groups of model-sized chunks."""
+    start = time.perf_counter()
+    audio = load_audio(path)
+    groups = plan_chunks(audio)
+    return audio, groups, time.perf_counter() - start
+
+
+class _FileState:
+    def __init__(self, path, audio_seconds, groups, decode_seconds, started):
+        self.path = path
+        self.audio_seconds = audio_seconds
+        self.groups = groups
+        self.chunks = [chunk for group in groups for chunk in group]
+        self.texts = [None] * len(self.chunks)
+        self.remaining = len(self.chunks)
+        self.decode_seconds = decode_seconds
+        self.inference_seconds = 0.0
+        self.started = started
+        self.failed = False
+
+    def record(self):
+        # Called once every chunk has its text
+        segments = group_segments(self.groups, self.texts)
+        return {
+            "path": self.path,
+            "status": "ok",
+            "transcription": " ".join(s["text"] for s in segments if s["text"]),
+            "segments": segments,
+            "audio_seconds": round(self.audio_seconds, 3),
+            "decode_seconds": round(self.decode_seconds, 4),
+            "inference_seconds": round(self.inference_seconds, 4),
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+        }
+
+
+def _bucket(chunk):
+    seconds = len(chunk.audio) / SAMPLE_RATE
+    for edge in BUCKET_EDGES:
+        if seconds <= edge:
+            return edge
+    return BUCKET_EDGES[-1]
+
+
+def run(paths, output_path, batch_size=16, decode_workers=None, inference_workers=1,
+        prefetch=64, language=None, transcribe_fn=None, profile_rate=0.0, log=print,
+        on_record=None, cancel_event=None, model_id=None, on_start=None):
+    """
+    Transcribe many files, writing one JSON line per file as it completes.
+
+    Files are decoded by a thread pool while earlier files are being
+    transcribed. Their speech chunks are grouped by length so each batch
+    holds clips of similar duration and decodes with a token budget sized for
+    its bucket. Up to inference_workers batches run at the same time.
+
+    Args:
+        paths: Files to transcribe
+        output_path: JSONL file to append results to, or None to only report them to on_record
+        batch_size: Chunks per generate call
+        decode_workers: Decode threads (defaults to the number of cores)
+        inference_workers: Batches run concurrently
+        prefetch: Maximum number of decoded files waiting for inference
+        transcribe_fn: Callable (audios, max_new_tokens) -> texts; defaults to the local model
+        profile_rate: Fraction of batches run under torch.profiler (traces go to STT_PROFILE_DIR)
+        on_record: Optional callable receiving each file's record as soon as it is written
+        cancel_event: Optional threading.Event; once set, no new work is started, the
+            running batch is stopped and files not finished yet are left out
+        model_id: Model to load when transcribe_fn is not given (defaults to STT_MODEL_ID)
+        on_start: Optional callable receiving each path when work on it begins
+
+    Returns:
+        Dict with counts and throughput of this run
+    """
+    if transcribe_fn is None:
+        entry = model_registry.get_model(model_id)
+        transcribe_fn = lambda audios, max_new_tokens: transcribe_batch(
+            entry, audios, language, max_new_tokens, cancel_event=cancel_event
+        )
+
+    def infer(batch, max_new_tokens):
+        start = time.perf_counter()
+        try:
+            with profiling.maybe_profile("batch", rate=profile_rate) as profile:
+                texts = transcribe_fn([chunk.audio for _, _, chunk in batch], max_new_tokens)
+        except Exception as e:
+            raise BatchError(batch) from e
+        if profile is not None and not profile.skipped:
+            log(f"Profiled a batch of {len(batch)} chunks: {profile.trace_path}")
+        return batch, texts, time.perf_counter() - start
+
+    decode_pool = ThreadPoolExecutor(decode_workers or os.cpu_count() or 1)
+    infer_pool = ThreadPoolExecutor(inference_workers)
+
+    inputs = iter(paths)
+    decoding = {}
+    inferring = set()
+    buckets = {edge: [] for edge in BUCKET_EDGES}
+    waiting_files = 0
+    exhausted = False
+    counts = {"ok": 0, "error": 0}
+    audio_seconds = 0.0
+    run_start = time.perf_counter()
+
+    out = open(output_path, "a", encoding="utf-8") if output_path else None
+    cancelled = False
+
+    def write(record):
+        if out is not None:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+        if on_record is not None:
+            on_record(record)
+        counts[record["status"]] += 1
+        if record["status"] == "ok":
+            log(f"[{counts['ok'] + counts['error']}/{len(paths)}] {record['path']} "
+                f"({record['audio_seconds']:.1f}s audio, {record['total_seconds']:.2f}s)")
+        else:
+            log(f"[{counts['ok'] + counts['error']}/{len(paths)}] {record['path']} failed: {record['error']}")
+
+    def submit(edge):
+        batch = buckets[edge][:batch_size]
+        buckets[edge] = buckets[edge][batch_size:]
+        inferring.add(infer_pool.submit(infer, batch, token_budget(edge)))
+
+    try:
+        while True:
+            # Keep the decode pool busy without letting decoded audio pile up
+            while not exhausted and len(decoding) + waiting_files < prefetch:
+                path = next(inputs, None)
+                if path is None:
+                    exhausted = True
+                    break
+                if on_start is not None:
+                    on_start(path)
+                decoding[decode_pool.submit(decode_file, path)] = (path, time.perf_counter())
+
+            if not decoding and not inferring and not any(buckets.values()):
+                break
+
+            # Flush partial buckets when nothing else can make progress
+            if not inferring and (exhausted and not decoding or len(decoding) + waiting_files >= prefetch):
+                fullest = max(buckets, key=lambda edge: len(buckets[edge]))
+                if buckets[fullest]:
+                    submit(fullest)
+
+            # With a cancel event, wake up regularly to check it
+            done, _ = wait(set(decoding) | inferring, timeout=0.2 if cancel_event is not None else None,
+                           return_when=FIRST_COMPLETED)
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                break
+            for future in done:
+                if future in decoding:
+                    path, started = decoding.pop(future)
+                    try:
+                        audio, groups, decode_seconds = future.result()
+                    except Exception as e:
+                        write({"path": path, "status": "error", "error": str(e)})
+                        continue
+
+                    state = _FileState(path, len(audio) / SAMPLE_RATE, groups, decode_seconds, started)
+                    audio_seconds += state.audio_seconds
+                    if not state.chunks:
+                        # No speech at all: nothing to send to the model
+                        write(state.record())
+                        continue
+                    waiting_files += 1
+                    for index, chunk in enumerate(state.chunks):
+                        edge = _bucket(chunk)
+                        buckets[edge].append((state, index, chunk))
+                        if len(buckets[edge]) >= batch_size and len(inferring) < inference_workers:
+                            submit(edge)
+                else:
+                    inferring.discard(future)
+                    try:
+                        batch, texts, seconds = future.result()
+                    except BatchError as e:
+                        # Only the files with chunks in this batch fail; their other chunks are dropped
+                        failed = {id(state): state for state, _, _ in e.batch if not state.failed}
+                        for state in failed.values():
+                            state.failed = True
+                            waiting_files -= 1
+                            write({"path": state.path, "status": "error", "error": str(e.__cause__)})
+                        for edge in BUCKET_EDGES:
+                            buckets[edge] = [item for item in buckets[edge] if not item[0].failed]
+                        continue
+                    total = sum(len(chunk.audio) for _, _, chunk in batch) or 1
+                    for (state, index, chunk), text in zip(batch, texts):
+                        if state.failed:
+                            # Already reported by another batch that failed
+                            continue
+                        state.texts[index] = text
+                        state.remaining -= 1
+                        # Share the batch time out by each chunk's length
+                        state.inference_seconds += seconds * len(chunk.audio) / total
+                        if state.remaining == 0:
+                            waiting_files -= 1
+                            write(state.record())
+
+            # Start full buckets as soon as an inference slot frees up
+            for edge in BUCKET_EDGES:
+                while len(buckets[edge]) >= batch_size and len(inferring) < inference_workers:
+                    submit(edge)
+    finally:
+        if out is not None:
+            out.close()
+        decode_pool.shutdown(wait=False, cancel_futures=True)
+        infer_pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.perf_counter() - run_start
+    return {
+        "files": counts["ok"] + counts["error"],
+        "ok": counts["ok"],
+        "errors": counts["error"],
+        "audio_seconds": round(audio_seconds, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "real_time_factor": round(elapsed / audio_seconds, 4) if audio_seconds else None,
+        "cancelled": cancelled,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="app.py batch", description="Transcribe a directory or manifest of recordings")
+    parser.add_argument("source", help="Directory of audio files, or a manifest with one path (or JSON object with 'path') per line")
+    parser.add_argument("-o", "--output", default="transcriptions.jsonl", help="JSONL output file (appended to; used to resume)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Speech chunks per generate call")
+    parser.add_argument("--decode-workers", type=int, default=None, help="Decode threads (default: number of cores)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Inference worker processes (default: run in this process)")
+    parser.add_argument("--prefetch", type=int, default=64, help="Decoded files allowed to wait for inference")
+    parser.add_argument("--model", help="Model name from STT_MODELS_DIR, Hugging Face ID or checkpoint directory "
+                                         "(default: STT_MODEL_ID)")
+    parser.add_argument("--language", help="Whisper language code (default: STT_LANGUAGE or jw)")
+    parser.add_argument("--no-resume", action="store_true", help="Transcribe files already in the output again")
+    parser.add_argument("--profile-sample-rate", type=float, default=0.0,
+                        help="Fraction of batches to run under torch.profiler (in-process inference only)")
+    args = parser.parse_args(argv)
+
+    paths = find_inputs(args.source)
+    if not args.no_resume:
+        completed = load_completed(args.output)
+        skipped = sum(1 for p in paths if p in completed)
+        paths = [p for p in paths if p not in completed]
+        if skipped:
+            print(f"Resuming: {skipped} files already transcribed in {args.output}")
+    if not paths:
+        print("Nothing to transcribe.")
+        return 0
+
+    model_id = model_registry.resolve(args.model, allow_ids=True)
+    pool = None
+    transcribe_fn = None
+    inference_workers = 1
+    if args.workers > 0:
+        from worker_pool import WorkerPool
+        pool = WorkerPool(args.workers, model_id=model_id, language=args.language).start()
+        transcribe_fn = lambda audios, max_new_tokens: pool.transcribe(audios, args.language, max_new_tokens)
+        inference_workers = args.workers
+
+    try:
+        summary = run(
+            paths, args.output,
+            batch_size=args.batch_size,
+            decode_workers=args.decode_workers,
+            inference_workers=inference_workers,
+            prefetch=args.prefetch,
+            language=args.language,
+            transcribe_fn=transcribe_fn,
+            profile_rate=args.profile_sample_rate,
+            model_id=model_id,
+        )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print(json.dumps(summary))
+    return 0 if summary["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+import model_registry
+
+SAMPLE_RATE = 16000
+
+# Whisper encodes fixed 30 second windows; longer clips go through the chunking pipeline
+MAX_BATCH_SECONDS = 30
+
+# Weight of the newest batch in the moving average of processing speed
+RTF_SMOOTHING = 0.2
+
+
+class QueueFullError(Exception):
+    """Raised when the batcher already has max_queue_depth requests waiting."""
+
+
+class CancelledError(Exception):
+    """Raised when a transcription is cancelled while it is generating."""
+
+
+class _Request:
+    def __init__(self, audio, language, cancel_event=None, model_id=None, max_new_tokens=None):
+        self.audio = audio
+        self.language = language
+        self.model_id = model_id
+        self.max_new_tokens = max_new_tokens
+        self.cancel_event = cancel_event
+        self.done = threading.Event()
+        self.text = None
+        self.error = None
+        self.batch_size = 0
+
+    def cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+
+class _AllCancelled:
+    """Event-like view of a batch that reads as set once every request in it is cancelled."""
+
+    def __init__(self, requests):
+        self.requests = requests
+
+    def is_set(self):
+        return all(req.cancelled() for req in self.requests)
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent transcription requests into batched generate calls.
+
+    Requests are queued by submit(). A background thread takes the first
+    waiting request, keeps collecting until either max_batch_size requests are
+    gathered or max_wait_ms has passed, then runs a single feature extraction
+    and generate call for the whole batch and hands each caller its own text.
+    """
+
+    def __init__(self, model_id=None, max_batch_size=8, max_wait_ms=20, max_queue_depth=64,
+                 language=None, max_new_tokens=128, runner=None, concurrency=1):
+        """
+        Args:
+            model_id: Model to transcribe with (defaults to the registry default)
+            max_batch_size: Maximum number of clips per generate call
+            max_wait_ms: How long the first clip of a batch waits for others
+            max_queue_depth: Clips allowed to wait before submit() raises QueueFullError
+            language: Default Whisper language code (defaults to STT_LANGUAGE or "jw")
+            max_new_tokens: Decode budget per clip
+            runner: Optional callable (audios, language, max_new_tokens) -> texts that
+                runs batches of the default model elsewhere, e.g. WorkerPool.transcribe
+            concurrency: Number of batches run at the same time (one per pool worker)
+        """
+        self.model_id = model_id
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self.language = model_registry.normalize_language(language)
+        self.max_new_tokens = max_new_tokens
+        self.runner = runner
+        self.concurrency = concurrency
+
+        self._queue = queue.Queue()
+        self._enqueue_lock = threading.Lock()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._rejected = 0
+        self._cancelled = 0
+        # Samples queued or being transcribed, and the recent processing speed per
+        # (model, token budget) as seconds of work per second of audio
+        self._pending_samples = 0
+        self._real_time_factors = {}
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Create a batcher configured from STT_MAX_BATCH_SIZE, STT_MAX_BATCH_WAIT_MS and STT_MAX_QUEUE_DEPTH."""
+        kwargs.setdefault("max_batch_size", int(os.environ.get("STT_MAX_BATCH_SIZE", 8)))
+        kwargs.setdefault("max_wait_ms", float(os.environ.get("STT_MAX_BATCH_WAIT_MS", 20)))
+        kwargs.setdefault("max_queue_depth", int(os.environ.get("STT_MAX_QUEUE_DEPTH", 64)))
+        return cls(**kwargs)
+
+    def start(self):
+        with self._enqueue_lock:
+            while len(self._threads) < self.concurrency:
+                thread = threading.Thread(target=self._run, name=f"micro-batcher-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def submit(self, audio, language=None, timeout=None, cancel_event=None, model_id=None, max_new_tokens=None):
+        """
+        Transcribe a 16 kHz mono float32 array, batching it with concurrent calls.
+
+        Args:
+            audio: 1-D NumPy array of samples at 16 kHz
+            language: Whisper language code (defaults to the batcher's language)
+            model_id: Model to use (defaults to the batcher's model); clips only share
+                a batch with clips for the same model, language and token budget
+            max_new_tokens: Decode budget (defaults to the batcher's max_new_tokens)
+            timeout: Seconds to wait for the result, None to wait forever
+            cancel_event: Optional threading.Event; once set, the clip is dropped if it
+                is still queued, generation stops if every clip in its batch is
+                cancelled, and CancelledError is raised
+
+        Returns:
+            Tuple of (transcribed text, size of the batch it ran in)
+        """
+        language = model_registry.normalize_language(language) if language else self.language
+        model_id = model_id or self.model_id
+
+        if len(audio) > MAX_BATCH_SECONDS * SAMPLE_RATE:
+            # Long recordings are split into windows by the pipeline itself
+            pipe = model_registry.get_pipeline(model_id)
+            result = pipe({"raw": audio, "sampling_rate": SAMPLE_RATE}, generate_kwargs={"language": language})
+            with self._stats_lock:
+                self._requests += 1
+                self._batch_sizes[1] += 1
+            return result["text"], 1
+
+        req = self._enqueue([audio], language, cancel_event, model_id, max_new_tokens)[0]
+        return self._wait(req, timeout), req.batch_size
+
+    def submit_many(self, audios, language=None, timeout=None, cancel_event=None, model_id=None, max_new_tokens=None):
+        """
+        Transcribe several arrays of at most 30 seconds each as one unit.
+
+        All arrays are queued together so they share batches with each other
+        and with concurrent requests.
+
+        Returns:
+            Tuple of (transcribed texts in the same order as audios, largest batch size they ran in)
+        """
+        language = model_registry.normalize_language(language) if language else self.language
+        if any(len(audio) > MAX_BATCH_SECONDS * SAMPLE_RATE for audio in audios):
+            raise ValueError(f"submit_many() takes clips of at most {MAX_BATCH_SECONDS} seconds")
+        requests = self._enqueue(audios, language, cancel_event, model_id or self.model_id, max_new_tokens)
+        texts = [self._wait(req, timeout) for req in requests]
+        return texts, max((req.batch_size for req in requests), default=0)
+
+    def _enqueue(self, audios, language, cancel_event=None, model_id=None, max_new_tokens=None):
+        if len(self._threads) < self.concurrency:
+            self.start()
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        requests = [_Request(audio, language, cancel_event, model_id, max_new_tokens) for audio in audios]
+
+        # All or nothing, so a partially queued request cannot be left behind
+        with self._enqueue_lock:
+            if self._queue.qsize() + len(requests) > self.max_queue_depth:
+                with self._stats_lock:
+                    self._rejected += 1
+                raise QueueFullError(f"Transcription queue is full ({self.max_queue_depth} requests waiting)")
+            for req in requests:
+                self._queue.put_nowait(req)
+        with self._stats_lock:
+            self._pending_samples += sum(len(req.audio) for req in requests)
+        return requests
+
+    @staticmethod
+    def _wait(req, timeout):
+        if req.cancel_event is not None:
+            # Give the caller back its thread as soon as it cancels, even while the clip is queued
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not req.done.wait(0.05):
+                if req.cancelled():
+                    raise CancelledError("Transcription was cancelled")
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError("Timed out waiting for transcription")
+        elif not req.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for transcription")
+        if req.error is not None:
+            raise req.error
+        return req.text
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def pending_seconds(self):
+        """Seconds of audio queued or being transcribed."""
+        with self._stats_lock:
+            return self._pending_samples / SAMPLE_RATE
+
+    def real_time_factor(self, model_id=None, max_new_tokens=None):
+        """
+        Recent processing seconds per second of audio for batches of one model and token budget.
+
+        Returns:
+            Moving average over recent batches, or None before the first batch
+        """
+        key = (model_id or self.model_id, max_new_tokens or self.max_new_tokens)
+        with self._stats_lock:
+            return self._real_time_factors.get(key)
+
+    def stats(self):
+        """Return counters describing the batch sizes achieved so far."""
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                "requests": self._requests,
+                "rejected": self._rejected,
+                "cancelled": self._cancelled,
+                "batches": batches,
+                "mean_batch_size": (self._requests / batches) if batches else 0.0,
+                "batch_sizes": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                "queue_depth": self.queue_depth(),
+                "pending_seconds": round(self._pending_samples / SAMPLE_RATE, 3),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_queue_depth": self.max_queue_depth,
+            }
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            # Clips whose caller gave up while they were queued never reach the model.
+            # Checked once per clip, so one cancelled in between cannot fall through both lists.
+            cancelled, live = [], []
+            for req in batch:
+                (cancelled if req.cancelled() else live).append(req)
+            for req in cancelled:
+                req.error = CancelledError("Transcription was cancelled")
+                req.done.set()
+            if cancelled:
+                with self._stats_lock:
+                    self._cancelled += len(cancelled)
+                    self._pending_samples -= sum(len(req.audio) for req in cancelled)
+
+            # Model and generation settings must match within one generate call
+            groups = {}
+            for req in live:
+                groups.setdefault((req.model_id, req.language, req.max_new_tokens), []).append(req)
+
+            for (model_id, language, max_new_tokens), requests in groups.items():
+                samples = sum(len(req.audio) for req in requests)
+                start = time.perf_counter()
+                try:
+                    texts = self._transcribe_batch([req.audio for req in requests], language,
+                                                   _AllCancelled(requests), model_id, max_new_tokens)
+                    for req, text in zip(requests, texts):
+                        req.text = text
+                except Exception as e:
+                    for req in requests:
+                        req.error = e
+
+                with self._stats_lock:
+                    self._requests += len(requests)
+                    self._batch_sizes[len(requests)] += 1
+                    self._pending_samples -= samples
+                    if samples and all(req.error is None for req in requests):
+                        rtf = (time.perf_counter() - start) / (samples / SAMPLE_RATE)
+                        key = (model_id or self.model_id, max_new_tokens)
+                        previous = self._real_time_factors.get(key)
+                        self._real_time_factors[key] = rtf if previous is None else (
+                            previous + RTF_SMOOTHING * (rtf - previous))
+                for req in requests:
+                    req.batch_size = len(requests)
+                    req.done.set()
+
+    def _transcribe_batch(self, audios, language, cancel_event=None, model_id=None, max_new_tokens=None):
+        model_id = model_id or self.model_id
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        if self.runner is not None and model_id == self.model_id:
+            # Worker processes always finish a batch; only queued clips can be dropped
+            return self.runner(audios, language, max_new_tokens)
+        # Imported here so importing the batcher does not pull in torch
+        from inference import transcribe_batch
+        return transcribe_batch(model_registry.get_model(model_id), audios, language, max_new_tokens,
+                                cancel_event=cancel_event)
@@ -0,0 +1,245 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import torch
+
+import model_registry
+from audio_io import SAMPLE_RATE, load_audio
+from batch_transcribe import find_inputs
+from inference import transcribe_audio
+
+# Clip lengths (seconds) of the synthetic corpus; the last one exercises long-form chunking
+CORPUS_SECONDS = (2, 5, 10, 20, 45)
+
+DTYPES = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+}
+
+# Metrics compared against the baseline, and whether higher is better
+COMPARED_METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "real_time_factor": False,
+    "throughput_audio_s_per_s": True,
+}
+
+
+def synthetic_speech(seconds, seed, sampling_rate=SAMPLE_RATE):
+    """
+    Speech-like test signal: voiced syllables with a few harmonics, words
+    separated by short pauses, over a low noise floor.
+
+    The same seconds and seed always give the same samples.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sampling_rate)
+    audio = rng.normal(0, 0.002, n).astype(np.float32)
+
+    position = int(0.3 * sampling_rate)
+    while position < n:
+        # One word of 2-4 syllables
+        for _ in range(rng.integers(2, 5)):
+            length = int(rng.uniform(0.12, 0.25) * sampling_rate)
+            if position + length >= n:
+                break
+            t = np.arange(length) / sampling_rate
+            f0 = rng.uniform(100, 220)
+            voiced = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+            envelope = np.sin(np.pi * np.arange(length) / length) ** 2
+            audio[position:position + length] += (0.2 * envelope * voiced).astype(np.float32)
+            position += length
+        position += int(rng.uniform(0.1, 0.6) * sampling_rate)
+    return np.clip(audio, -1, 1)
+
+
+def make_corpus(lengths=CORPUS_SECONDS, per_length=2, seed=0):
+    """Deterministic synthetic corpus; returns a list of (name, audio)."""
+    corpus = []
+    for i, (seconds, copy) in enumerate(itertools.product(lengths, range(per_length))):
+        corpus.append((f"synthetic-{seconds}s-{copy}", synthetic_speech(seconds, seed + i)))
+    return corpus
+
+
+def load_corpus(source):
+    """Decode local recordings from a directory or manifest; returns a list of (name, audio)."""
+    return [(os.path.basename(path), load_audio(path)) for path in find_inputs(source)]
+
+
+def percentile_ms(latencies, q):
+    return round(float(np.percentile(latencies, q)) * 1000, 2)
+
+
+def run_config(corpus, backend, dtype, threads, batch_size, repeats, language=None):
+    """
+    Benchmark transcribe_audio with one configuration.
+
+    The model is loaded from scratch so load time and the first (cold)
+    request are measured, then the corpus is transcribed repeats times.
+    """
+    torch.set_num_threads(threads)
+    model_registry.clear()
+
+    start = time.perf_counter()
+    model_registry.get_model(backend=backend, torch_dtype=DTYPES[dtype])
+    load_seconds = time.perf_counter() - start
+
+    def transcribe(audio):
+        return transcribe_audio(audio, language=language, batch_size=batch_size,
+                                backend=backend, torch_dtype=DTYPES[dtype])
+
+    # Cold request: the first inference pays for lazy allocations (and compilation)
+    start = time.perf_counter()
+    transcribe(corpus[0][1])
+    first_request_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for _, audio in corpus:
+            clip_start = time.perf_counter()
+            transcribe(audio)
+            latencies.append(time.perf_counter() - clip_start)
+            audio_seconds += len(audio) / SAMPLE_RATE
+    elapsed = time.perf_counter() - start
+
+    return {
+        "backend": backend,
+        "dtype": dtype,
+        "threads": threads,
+        "batch_size": batch_size,
+        "load_seconds": round(load_seconds, 3),
+        "first_request_ms": round(first_request_ms, 2),
+        "requests": len(latencies),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "throughput_requests_per_s": round(len(latencies) / elapsed, 3),
+        "throughput_audio_s_per_s": round(audio_seconds / elapsed, 3),
+        "real_time_factor": round(elapsed / audio_seconds, 5),
+    }
+
+
+def config_key(result):
+    return f"{result['backend']}/{result['dtype']}/threads={result['threads']}/batch={result['batch_size']}"
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a baseline report.
+
+    Returns:
+        List of regressions: configurations where a compared metric is worse
+        than the baseline by more than tolerance (a fraction)
+    """
+    previous = {config_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get(config_key(result))
+        if before is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append({
+                    "config": config_key(result),
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": round(change, 4),
+                })
+    return regressions
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "cuda": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
+        "model_id": model_registry.DEFAULT_MODEL_ID,
+        "commit": commit,
+    }
+
+
+def parse_list(value, cast=str):
+    return [cast(v.strip()) for v in value.split(",") if v.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark transcribe_audio across batch sizes, dtypes, threads and backends")
+    parser.add_argument("--corpus", help="Directory or manifest of local recordings (default: synthetic corpus)")
+    parser.add_argument("--per-length", type=int, default=2, help="Synthetic clips per length")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-sizes", default="1,8")
+    parser.add_argument("--dtypes", default="float32", help=f"Comma-separated ({', '.join(DTYPES)})")
+    parser.add_argument("--threads", default=str(torch.get_num_threads()))
+    parser.add_argument("--backends", default="eager")
+    parser.add_argument("--repeats", type=int, default=3, help="Passes over the corpus per configuration")
+    parser.add_argument("--language", help="Whisper language code (default: STT_LANGUAGE or jw)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Report to compare against; exits with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else make_corpus(per_length=args.per_length, seed=args.seed)
+    if not corpus:
+        print(f"No audio files found in {args.corpus}")
+        sys.exit(1)
+
+    results = []
+    for backend, dtype, threads, batch_size in itertools.product(
+        parse_list(args.backends), parse_list(args.dtypes), parse_list(args.threads, int), parse_list(args.batch_sizes, int)
+    ):
+        try:
+            result = run_config(corpus, backend, dtype, threads, batch_size, args.repeats, args.language)
+        except Exception as e:
+            # e.g. int8 on GPU, or an optional backend that is not installed
+            result = {"backend": backend, "dtype": dtype, "threads": threads, "batch_size": batch_size, "error": str(e)}
+        results.append(result)
+        print(json.dumps(result), flush=True)
+
+    report = {
+        "environment": environment(),
+        "corpus": {
+            "source": args.corpus or f"synthetic(seed={args.seed}, per_length={args.per_length})",
+            "clips": len(corpus),
+            "audio_seconds": round(sum(len(audio) for _, audio in corpus) / SAMPLE_RATE, 2),
+        },
+        "repeats": args.repeats,
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report["baseline"] = args.baseline
+        report["regressions"] = regressions
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression['config']}: {regression['metric']} "
+              f"{regression['baseline']} -> {regression['current']} ({regression['change']:+.1%})")
+    sys.exit(1 if regressions else 0)
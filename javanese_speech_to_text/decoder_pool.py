@@ -0,0 +1,228 @@
+"""
+Pool of ffmpeg decoders for compressed audio (WebM/Opus, MP3, AAC, ...).
+
+Each worker thread keeps an ffmpeg process started ahead of time, waiting on
+its stdin, so process start-up is paid while the worker is idle rather than
+inside a request. A payload is streamed into that process over a pipe and
+comes back as 16 kHz mono float32 PCM on another; nothing touches disk.
+ffmpeg decodes one input stream per process, so a used process is replaced
+by a fresh one in the background.
+
+The ffmpeg command line is built with ffmpeg-python when it is installed
+(pip install ffmpeg-python); the binary is taken from STT_FFMPEG (default
+"ffmpeg" on the PATH).
+"""
+import atexit
+import os
+import queue
+import subprocess
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+# Decoder processes kept running; also the number of payloads decoded at once
+DECODE_WORKERS = int(os.environ.get('STT_DECODE_WORKERS', 0)) or min(4, os.cpu_count() or 1)
+
+# ffmpeg binary
+FFMPEG = os.environ.get('STT_FFMPEG', 'ffmpeg')
+
+# Bytes written to a decoder's stdin per call
+PIPE_CHUNK = 1 << 16
+
+
+def ffmpeg_command(sampling_rate, binary=FFMPEG):
+    """
+    ffmpeg arguments that read any container from stdin and write mono float32 PCM to stdout.
+
+    Args:
+        sampling_rate: Sample rate of the decoded audio
+        binary: ffmpeg executable
+
+    Returns:
+        List of command line arguments
+    """
+    try:
+        import ffmpeg
+    except ImportError:
+        return [
+            binary, "-nostdin", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+            "-vn", "-ac", "1", "-ar", str(sampling_rate), "-f", "f32le", "-acodec", "pcm_f32le", "pipe:1",
+        ]
+    stream = ffmpeg.input("pipe:0").output(
+        "pipe:1", vn=None, ac=1, ar=sampling_rate, format="f32le", acodec="pcm_f32le"
+    )
+    return stream.global_args("-nostdin", "-hide_banner", "-loglevel", "error").compile(cmd=binary)
+
+
+class _Decoder:
+    """One worker: a thread that owns a pre-started ffmpeg process."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.process = None
+        self.sampling_rate = None
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _spawn(self, sampling_rate):
+        self.process = subprocess.Popen(
+            self.pool.command(sampling_rate),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        self.sampling_rate = sampling_rate
+
+    def _take(self, sampling_rate):
+        """The spare process if it is still usable at this rate, otherwise a new one."""
+        process = self.process
+        self.process = None
+        if process is not None and (process.poll() is not None or self.sampling_rate != sampling_rate):
+            self._kill(process)
+            process = None
+        if process is None:
+            self._spawn(sampling_rate)
+            process, self.process = self.process, None
+        return process
+
+    @staticmethod
+    def _kill(process):
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        for pipe in (process.stdin, process.stdout, process.stderr):
+            pipe.close()
+
+    def _loop(self):
+        while True:
+            if self.process is None and not self.pool.closed:
+                try:
+                    # Start the next decoder while idle; failures surface on the next job
+                    self._spawn(self.pool.sampling_rate)
+                except OSError:
+                    self.process = None
+            job = self.pool.jobs.get()
+            if job is None:
+                if self.process is not None:
+                    self._kill(self.process)
+                    self.process = None
+                return
+            data, sampling_rate, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._decode(data, sampling_rate))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _decode(self, data, sampling_rate):
+        try:
+            process = self._take(sampling_rate)
+        except FileNotFoundError:
+            raise ValueError(
+                f"ffmpeg was not found ('{self.pool.binary}'); install ffmpeg or set STT_FFMPEG to decode this audio format"
+            ) from None
+
+        # Feed stdin from a second thread while this one drains stdout, so neither pipe fills up
+        errors = []
+        def feed():
+            try:
+                view = memoryview(data)
+                for offset in range(0, len(view), PIPE_CHUNK):
+                    process.stdin.write(view[offset:offset + PIPE_CHUNK])
+                process.stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+            errors.append(process.stderr.read())
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        try:
+            output = process.stdout.read()
+            feeder.join()
+            returncode = process.wait()
+        finally:
+            self._kill(process)
+
+        if returncode != 0:
+            message = errors[0].decode("utf-8", "replace").strip().splitlines() if errors and errors[0] else []
+            raise ValueError(f"Could not decode audio: {message[-1] if message else f'ffmpeg exited with code {returncode}'}")
+        # Whole float32 samples only; a truncated last sample is dropped
+        usable = len(output) - len(output) % 4
+        return np.frombuffer(output, dtype=np.float32, count=usable // 4)
+
+
+class DecoderPool:
+    """
+    Fixed set of ffmpeg decoder workers fed from one queue.
+
+    decode() blocks the calling thread until a worker has decoded the payload,
+    so at most num_workers ffmpeg decodes run at a time however many requests
+    arrive together.
+    """
+
+    def __init__(self, num_workers=DECODE_WORKERS, sampling_rate=16000, binary=FFMPEG):
+        """
+        Args:
+            num_workers: Number of decoder workers (and ffmpeg processes kept ready)
+            sampling_rate: Sample rate the spare processes are started for
+            binary: ffmpeg executable
+        """
+        self.binary = binary
+        self.sampling_rate = sampling_rate
+        self.jobs = queue.Queue()
+        self.closed = False
+        self._commands = {}
+        self.workers = [_Decoder(self) for _ in range(num_workers)]
+
+    def command(self, sampling_rate):
+        if sampling_rate not in self._commands:
+            self._commands[sampling_rate] = ffmpeg_command(sampling_rate, self.binary)
+        return self._commands[sampling_rate]
+
+    def decode(self, data, sampling_rate=16000):
+        """
+        Decode an encoded payload to mono float32 PCM.
+
+        Args:
+            data: Encoded audio bytes, bytearray or memoryview
+            sampling_rate: Sample rate of the returned audio
+
+        Returns:
+            1-D float32 NumPy array
+        """
+        if self.closed:
+            raise RuntimeError("Decoder pool is shut down")
+        future = Future()
+        self.jobs.put((data, sampling_rate, future))
+        return future.result()
+
+    def shutdown(self):
+        """Stop the workers and kill their spare ffmpeg processes."""
+        if self.closed:
+            return
+        self.closed = True
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.thread.join(timeout=5)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    The process-wide decoder pool, started on first use.
+
+    A forked child does not inherit the parent's worker threads, so it gets a
+    pool of its own.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = DecoderPool()
+            _pool_pid = os.getpid()
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -0,0 +1,122 @@
+"""
+Batched log-mel frontend for Whisper.
+
+Computes the same features as the Hugging Face WhisperFeatureExtractor, but
+for a whole batch in one pass: the mel filterbank and STFT window are built
+once per model, and the padded waveform and spectrogram buffers are reused
+across batches instead of being allocated per call.
+"""
+import threading
+
+import numpy as np
+import torch
+
+
+class LogMelFrontend:
+    """
+    Log-mel spectrograms of a batch of 16 kHz clips, padded to Whisper's 30 second window.
+
+    Buffers are kept per thread, so concurrent batchers and pool threads can
+    share one frontend. The returned features live in those buffers and are
+    overwritten by the next call on the same thread.
+    """
+
+    def __init__(self, feature_extractor, device="cpu"):
+        """
+        Args:
+            feature_extractor: WhisperFeatureExtractor whose settings (n_fft,
+                hop length, mel bins, window length) are reproduced
+            device: Device the features are computed on
+        """
+        self.device = torch.device(device)
+        self.n_fft = feature_extractor.n_fft
+        self.hop_length = feature_extractor.hop_length
+        self.n_samples = feature_extractor.n_samples
+        self.n_frames = feature_extractor.nb_max_frames
+        self.dither = getattr(feature_extractor, "dither", 0.0)
+
+        # (n_mels, n_freqs), so one matmul maps a batch of power spectra to mel bands
+        self.mel_filters = torch.from_numpy(np.ascontiguousarray(feature_extractor.mel_filters.T)).to(
+            self.device, torch.float32
+        )
+        self.window = torch.hann_window(self.n_fft, device=self.device)
+        self._frame_index = torch.arange(self.n_frames)
+        self._buffers = threading.local()
+
+    def _buffer(self, name, shape, device, pin=False):
+        """A per-thread buffer of at least shape[0] rows, grown when a larger batch comes in."""
+        buffer = getattr(self._buffers, name, None)
+        if buffer is None or buffer.shape[0] < shape[0]:
+            buffer = torch.empty(shape, dtype=torch.float32, device=device, pin_memory=pin)
+            setattr(self._buffers, name, buffer)
+        return buffer[:shape[0]]
+
+    def __call__(self, audios):
+        """
+        Args:
+            audios: List of 1-D float32 arrays at 16 kHz; longer than 30 seconds is truncated
+
+        Returns:
+            Tuple of (float32 features of shape (batch, n_mels, 3000), int32
+            attention mask of shape (batch, 3000))
+        """
+        batch_size = len(audios)
+        on_cpu = self.device.type == "cpu"
+
+        # Zero padding is only written past the end of each clip
+        staging = self._buffer("waveform", (batch_size, self.n_samples), "cpu", pin=not on_cpu)
+        lengths = []
+        for row, audio in zip(staging, audios):
+            audio = np.asarray(audio, dtype=np.float32)[:self.n_samples]
+            row[:len(audio)].copy_(torch.from_numpy(audio))
+            row[len(audio):].zero_()
+            lengths.append(len(audio))
+        if on_cpu:
+            waveform = staging
+        else:
+            waveform = self._buffer("device_waveform", staging.shape, self.device)
+            waveform.copy_(staging, non_blocking=True)
+
+        if self.dither:
+            waveform.add_(torch.randn_like(waveform), alpha=self.dither)
+
+        # Frames that only see zero padding have zero power, so the STFT stops a
+        # window past the longest clip; reflect padding there only mirrors zeros.
+        # Dither makes the padding non-zero, so then every frame is computed.
+        computed = min(self.n_frames, -(-(max(lengths, default=0) + self.n_fft) // self.hop_length))
+        if self.dither:
+            computed = self.n_frames
+        end = min(self.n_samples, computed * self.hop_length + self.n_fft)
+
+        # One STFT for the whole batch; the extractor drops the frame centred on the last sample
+        stft = torch.stft(waveform[:, :end], self.n_fft, self.hop_length, window=self.window, return_complex=True)
+        power = stft[..., :computed].abs().pow_(2)
+
+        log_spec = self._buffer("mel", (batch_size, self.mel_filters.shape[0], self.n_frames), self.device)
+        log_spec[..., :computed] = torch.matmul(self.mel_filters, power)
+        log_spec[..., computed:] = 0
+        log_spec.clamp_(min=1e-10).log10_()
+
+        # Dynamic range of 80 dB below each clip's own peak, then scaled to roughly [-1, 1]
+        peak = log_spec.amax(dim=(1, 2), keepdim=True)
+        torch.maximum(log_spec, peak - 8.0, out=log_spec)
+        log_spec.add_(4.0).div_(4.0)
+
+        # A frame is attended to if it starts inside the clip
+        frames = torch.tensor([-(-n // self.hop_length) for n in lengths])
+        attention_mask = (self._frame_index < frames[:, None]).to(torch.int32)
+        return log_spec, attention_mask
+
+
+def max_feature_error(frontend, feature_extractor, audios):
+    """
+    Largest absolute difference between this frontend and the Hugging Face
+    extractor on the same clips; used by parity_check.py.
+    """
+    expected = feature_extractor(
+        audios, sampling_rate=16000, return_tensors="pt", return_attention_mask=True
+    )
+    features, attention_mask = frontend(audios)
+    if not torch.equal(attention_mask.cpu(), expected.attention_mask.to(torch.int32)):
+        return float("inf")
+    return (features.cpu() - expected.input_features).abs().max().item()
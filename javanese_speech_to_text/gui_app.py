@@ -1,142 +1,309 @@
 import tkinter as tk
-from tkinter import filedialog, scrolledtext
+from tkinter import filedialog, scrolledtext, ttk
+import csv
+import json
+import os
+import queue
 import threading
-import torch
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+import time
+import profiling
+from batch_transcribe import AUDIO_EXTENSIONS, find_inputs, run
+from inference import warmup
+
+# Speech chunks per generate call when transcribing the queue
+BATCH_SIZE = 8
+
+# How often the Tk thread applies updates posted by worker threads
+UI_POLL_MS = 50
 
 class JavaneseSpeechToTextApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Javanese Speech-to-Text")
-        self.root.geometry("600x500")
+        self.root.geometry("800x600")
         
         # Model loading status
         self.model_loaded = False
-        self.model = None
-        self.processor = None
-        self.pipe = None
+        
+        # Queued files in the order they were added, and their results by path
+        self.paths = []
+        self.records = {}
+        self.running = False
+        self.cancel_event = None
+        
+        # Tk is not thread-safe: worker threads post callables here and the Tk thread runs them
+        self.ui_queue = queue.Queue()
         
         # Create UI elements
         self.create_widgets()
+        self.root.after(UI_POLL_MS, self.process_ui_queue)
+        
+        # Load and warm up the model once, in the background, for every file of the session
+        threading.Thread(target=self.load_model, daemon=True).start()
     
     def create_widgets(self):
-        # Frame for file selection
-        file_frame = tk.Frame(self.root)
-        file_frame.pack(fill=tk.X, padx=20, pady=20)
+        # Queue controls
+        button_frame = tk.Frame(self.root)
+        button_frame.pack(fill=tk.X, padx=20, pady=(20, 10))
+        
+        self.add_files_button = tk.Button(button_frame, text="Add Files", command=self.browse_files)
+        self.add_files_button.pack(side=tk.LEFT)
+        
+        self.add_folder_button = tk.Button(button_frame, text="Add Folder", command=self.browse_folder)
+        self.add_folder_button.pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.clear_button = tk.Button(button_frame, text="Clear", command=self.clear_queue)
+        self.clear_button.pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.export_button = tk.Button(button_frame, text="Export", command=self.export_results, state=tk.DISABLED)
+        self.export_button.pack(side=tk.RIGHT)
+        
+        self.cancel_button = tk.Button(button_frame, text="Cancel", command=self.cancel_transcription, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        self.transcribe_button = tk.Button(button_frame, text="Transcribe", command=self.start_transcription, state=tk.DISABLED)
+        self.transcribe_button.pack(side=tk.RIGHT, padx=(0, 10))
         
-        self.file_path_var = tk.StringVar()
-        self.file_path_entry = tk.Entry(file_frame, textvariable=self.file_path_var, width=50)
-        self.file_path_entry.pack(side=tk.LEFT, padx=(0, 10), fill=tk.X, expand=True)
+        # One row per queued file
+        list_frame = tk.Frame(self.root)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=20)
         
-        self.browse_button = tk.Button(file_frame, text="Browse", command=self.browse_file)
-        self.browse_button.pack(side=tk.RIGHT)
+        self.file_list = ttk.Treeview(list_frame, columns=("status", "audio", "speed"), height=10)
+        self.file_list.heading("#0", text="File")
+        self.file_list.heading("status", text="Status")
+        self.file_list.heading("audio", text="Audio")
+        self.file_list.heading("speed", text="Speed")
+        self.file_list.column("#0", width=380)
+        self.file_list.column("status", width=160)
+        self.file_list.column("audio", width=80, anchor=tk.E)
+        self.file_list.column("speed", width=80, anchor=tk.E)
+        self.file_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.file_list.bind("<<TreeviewSelect>>", self.show_selected)
         
-        # Transcribe button
-        self.transcribe_button = tk.Button(self.root, text="Transcribe", command=self.start_transcription)
-        self.transcribe_button.pack(pady=10)
+        list_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.file_list.yview)
+        list_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.file_list.config(yscrollcommand=list_scrollbar.set)
+        
+        # Overall progress and throughput
+        self.progress = ttk.Progressbar(self.root, mode="determinate")
+        self.progress.pack(fill=tk.X, padx=20, pady=(10, 0))
         
         # Status label
         self.status_var = tk.StringVar()
-        self.status_var.set("Ready")
+        self.status_var.set("Loading model...")
         self.status_label = tk.Label(self.root, textvariable=self.status_var)
         self.status_label.pack(pady=5)
         
-        # Text area for transcription result
+        # Text area for the selected file's transcription
         self.result_label = tk.Label(self.root, text="Transcription Result:")
         self.result_label.pack(anchor=tk.W, padx=20, pady=(10, 5))
         
-        self.result_text = scrolledtext.ScrolledText(self.root, wrap=tk.WORD, height=15)
+        self.result_text = scrolledtext.ScrolledText(self.root, wrap=tk.WORD, height=10)
         self.result_text.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
     
-    def browse_file(self):
-        file_path = filedialog.askopenfilename(
+    def post(self, callback, *args):
+        """Run callback(*args) on the Tk thread; safe to call from any thread."""
+        self.ui_queue.put((callback, args))
+    
+    def process_ui_queue(self):
+        while True:
+            try:
+                callback, args = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        self.root.after(UI_POLL_MS, self.process_ui_queue)
+    
+    def load_model(self):
+        try:
+            warmup()
+            self.model_loaded = True
+            self.post(self.status_var.set, "Model loaded successfully. Add files to transcribe.")
+            self.post(self.update_buttons)
+        except Exception as e:
+            self.post(self.status_var.set, f"Error loading model: {str(e)}")
+    
+    def browse_files(self):
+        file_paths = filedialog.askopenfilenames(
             filetypes=[
-                ("Audio Files", "*.wav *.mp3 *.ogg *.flac"),
+                ("Audio Files", " ".join(f"*{ext}" for ext in AUDIO_EXTENSIONS)),
                 ("All Files", "*.*")
             ]
         )
-        if file_path:
-            self.file_path_var.set(file_path)
+        self.add_paths(file_paths)
     
-    def load_model(self):
-        if not self.model_loaded:
-            self.status_var.set("Loading model... This may take a while.")
-            self.root.update()
-            
-            # Check if CUDA is available
-            device = "cuda:0" if torch.cuda.is_available() else "cpu"
-            torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-            
-            # Model ID on Hugging Face
-            model_id = "bagasshw/whisper-tiny-javanese-openslr-v3"
-            
-            try:
-                # Load model and processor
-                self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
-                    model_id, 
-                    torch_dtype=torch_dtype,
-                    low_cpu_mem_usage=True,
-                    use_safetensors=True
-                )
-                self.model.to(device)
-                
-                self.processor = AutoProcessor.from_pretrained(model_id)
-                
-                # Create pipeline
-                self.pipe = pipeline(
-                    "automatic-speech-recognition",
-                    model=self.model,
-                    tokenizer=self.processor.tokenizer,
-                    feature_extractor=self.processor.feature_extractor,
-                    max_new_tokens=128,
-                    chunk_length_s=30,
-                    batch_size=16,
-                    return_timestamps=False,
-                    torch_dtype=torch_dtype,
-                    device=device,
-                )
-                
-                self.model_loaded = True
-                self.status_var.set("Model loaded successfully")
-            except Exception as e:
-                self.status_var.set(f"Error loading model: {str(e)}")
+    def browse_folder(self):
+        folder = filedialog.askdirectory()
+        if folder:
+            self.add_paths(find_inputs(folder))
+    
+    def add_paths(self, paths):
+        added = 0
+        for path in paths:
+            if self.file_list.exists(path):
+                continue
+            self.paths.append(path)
+            self.file_list.insert("", tk.END, iid=path, text=os.path.basename(path), values=("Queued", "", ""))
+            added += 1
+        if added:
+            self.status_var.set(f"{added} files added, {self.pending_count()} waiting")
+        self.update_buttons()
+    
+    def clear_queue(self):
+        self.paths = []
+        self.records = {}
+        self.file_list.delete(*self.file_list.get_children())
+        self.result_text.delete(1.0, tk.END)
+        self.progress.config(value=0)
+        self.status_var.set("Queue cleared")
+        self.update_buttons()
+    
+    def pending_count(self):
+        return sum(1 for path in self.paths if path not in self.records)
+    
+    def update_buttons(self):
+        idle = tk.DISABLED if self.running else tk.NORMAL
+        self.add_files_button.config(state=idle)
+        self.add_folder_button.config(state=idle)
+        self.clear_button.config(state=idle)
+        self.transcribe_button.config(state=tk.NORMAL if self.model_loaded and not self.running and self.pending_count() else tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL if self.running else tk.DISABLED)
+        self.export_button.config(state=tk.NORMAL if self.records and not self.running else tk.DISABLED)
     
     def start_transcription(self):
-        audio_path = self.file_path_var.get()
-        if not audio_path:
-            self.status_var.set("Please select an audio file first")
+        paths = [path for path in self.paths if path not in self.records]
+        if not paths:
+            self.status_var.set("Please add audio files first")
             return
         
-        # Start transcription in a separate thread to keep UI responsive
-        threading.Thread(target=self.transcribe_audio, args=(audio_path,), daemon=True).start()
+        self.running = True
+        self.cancel_event = threading.Event()
+        self.progress.config(maximum=len(paths), value=0)
+        for path in paths:
+            self.file_list.set(path, "status", "Waiting")
+        self.status_var.set(f"Transcribing {len(paths)} files...")
+        self.update_buttons()
+        
+        # Transcribe in a separate thread to keep UI responsive
+        threading.Thread(target=self.transcribe_files, args=(paths, self.cancel_event), daemon=True).start()
+    
+    def cancel_transcription(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_button.config(state=tk.DISABLED)
+            self.status_var.set("Cancelling...")
     
-    def transcribe_audio(self, audio_path):
-        self.status_var.set("Transcribing... Please wait.")
-        self.transcribe_button.config(state=tk.DISABLED)
-        self.root.update()
+    def transcribe_files(self, paths, cancel_event):
+        started = time.perf_counter()
+        totals = {"files": 0, "audio_seconds": 0.0, "errors": 0}
+        
+        def on_record(record):
+            totals["files"] += 1
+            totals["errors"] += record["status"] == "error"
+            totals["audio_seconds"] += record.get("audio_seconds", 0.0)
+            self.post(self.show_record, record, dict(totals), time.perf_counter() - started, len(paths))
+        
+        def on_start(path):
+            self.post(self.file_list.set, path, "status", "Transcribing")
         
         try:
-            # Load model if not already loaded
-            if not self.model_loaded:
-                self.load_model()
-                if not self.model_loaded:
-                    return
-            
-            # Perform transcription
-            result = self.pipe(audio_path, generate_kwargs={"language": "jv"})
-            
-            # Update UI with result
-            self.result_text.delete(1.0, tk.END)
-            self.result_text.insert(tk.END, result["text"])
-            self.status_var.set("Transcription complete")
+            # Files are decoded in parallel and their speech batched together across files
+            # STT_PROFILE_SAMPLE_RATE profiles that fraction of the batches
+            summary = run(paths, None, batch_size=BATCH_SIZE, log=lambda message: None,
+                          on_record=on_record, cancel_event=cancel_event,
+                          profile_rate=profiling.PROFILE_SAMPLE_RATE, on_start=on_start)
         except Exception as e:
-            self.status_var.set(f"Error during transcription: {str(e)}")
-            self.result_text.delete(1.0, tk.END)
-            self.result_text.insert(tk.END, f"Error: {str(e)}")
-        finally:
-            self.transcribe_button.config(state=tk.NORMAL)
+            self.post(self.finish_transcription, {"error": str(e)})
+            return
+        # run() stops at its own cancel check and reports it as summary["cancelled"]
+        # Only count audio of files that finished, not ones cut short by a cancel
+        summary["audio_seconds"] = totals["audio_seconds"]
+        self.post(self.finish_transcription, summary)
+    
+    def show_record(self, record, totals, elapsed, total_files):
+        path = record["path"]
+        self.records[path] = record
+        if record["status"] == "ok":
+            # Processing speed of this file alone, without the time it waited for a batch
+            busy = record["decode_seconds"] + record["inference_seconds"]
+            speed = record["audio_seconds"] / busy if busy else 0
+            values = ("Done", f"{record['audio_seconds']:.1f}s", f"{speed:.1f}x")
+        else:
+            values = (f"Error: {record['error']}", "", "")
+        if self.file_list.exists(path):
+            self.file_list.item(path, values=values)
+            self.file_list.selection_set(path)
+            self.file_list.see(path)
+        
+        self.progress.config(value=totals["files"])
+        throughput = totals["audio_seconds"] / elapsed if elapsed else 0
+        self.status_var.set(f"{totals['files']}/{total_files} files, {totals['audio_seconds']:.0f}s of audio "
+                            f"in {elapsed:.0f}s ({throughput:.1f}x real time)")
+    
+    def finish_transcription(self, summary):
+        self.running = False
+        self.cancel_event = None
+        for path in self.paths:
+            if path not in self.records:
+                self.file_list.set(path, "status", "Cancelled" if summary.get("cancelled") else "Queued")
+        
+        if "error" in summary:
+            self.status_var.set(f"Error during transcription: {summary['error']}")
+        else:
+            word = "Cancelled after" if summary["cancelled"] else "Finished"
+            self.status_var.set(f"{word} {summary['files']} files ({summary['errors']} failed), "
+                                f"{summary['audio_seconds']:.0f}s of audio in {summary['elapsed_seconds']:.0f}s")
+        self.update_buttons()
+    
+    def show_selected(self, event=None):
+        selection = self.file_list.selection()
+        record = self.records.get(selection[0]) if selection else None
+        self.result_text.delete(1.0, tk.END)
+        if record is None:
+            return
+        if record["status"] == "ok":
+            self.result_text.insert(tk.END, record["transcription"])
+        else:
+            self.result_text.insert(tk.END, f"Error: {record['error']}")
+    
+    def export_results(self):
+        output_path = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[
+                ("Text", "*.txt"),
+                ("CSV", "*.csv"),
+                ("JSON Lines", "*.jsonl"),
+            ]
+        )
+        if not output_path:
+            return
+        
+        records = [self.records[path] for path in self.paths if path in self.records]
+        try:
+            export_records(records, output_path)
+            self.status_var.set(f"Exported {len(records)} results to {output_path}")
+        except OSError as e:
+            self.status_var.set(f"Error exporting results: {str(e)}")
+
+def export_records(records, output_path):
+    """Write transcription records as .csv, .jsonl or plain text, chosen by the file extension."""
+    extension = os.path.splitext(output_path)[1].lower()
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        if extension == ".csv":
+            writer = csv.writer(f)
+            writer.writerow(["path", "status", "audio_seconds", "transcription", "error"])
+            for record in records:
+                writer.writerow([record["path"], record["status"], record.get("audio_seconds", ""),
+                                 record.get("transcription", ""), record.get("error", "")])
+        elif extension == ".jsonl":
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            for record in records:
+                text = record["transcription"] if record["status"] == "ok" else f"Error: {record['error']}"
+                f.write(f"{record['path']}\n{text}\n\n")
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = JavaneseSpeechToTextApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
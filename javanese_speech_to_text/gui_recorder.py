@@ -1,13 +1,22 @@
 import tkinter as tk
+import queue
 import threading
-import torch
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 import sounddevice as sd
-import soundfile as sf
-import numpy as np
-import tempfile
-import os
-import time
+import profiling
+from audio_io import SAMPLE_RATE
+from model_registry import DEFAULT_LANGUAGE
+from inference import transcribe_batch, warmup
+from longform import token_budget
+from streaming import RingBuffer, StreamingSession
+
+# Audio held between the capture callback and the transcription thread
+RING_SECONDS = 30
+
+# Capture block size: 100 ms per callback
+BLOCK_SIZE = SAMPLE_RATE // 10
+
+# How often the Tk thread applies updates posted by worker threads
+UI_POLL_MS = 50
 
 class JavaneseSpeechRecorderApp:
     def __init__(self, root):
@@ -17,18 +26,22 @@ class JavaneseSpeechRecorderApp:
         
         # Model loading status
         self.model_loaded = False
-        self.model = None
-        self.processor = None
-        self.pipe = None
+        self.entry = None
         
         # Recording status
         self.is_recording = False
-        self.audio_path = None
+        self.stream = None
+        self.ring = None
+        self.stop_timer = None
+        
+        # Tk is not thread-safe: worker threads post callables here and the Tk thread runs them
+        self.ui_queue = queue.Queue()
         
         # Create UI elements
         self.create_widgets()
+        self.root.after(UI_POLL_MS, self.process_ui_queue)
         
-        # Start loading model in background
+        # Start loading and warming up the model in background
         threading.Thread(target=self.load_model, daemon=True).start()
     
     def create_widgets(self):
@@ -36,19 +49,16 @@ class JavaneseSpeechRecorderApp:
         control_frame = tk.Frame(self.root)
         control_frame.pack(fill=tk.X, padx=20, pady=20)
         
-        self.duration_label = tk.Label(control_frame, text="Recording duration (seconds):")
+        self.duration_label = tk.Label(control_frame, text="Stop after (seconds, 0 = manual):")
         self.duration_label.pack(side=tk.LEFT, padx=(0, 10))
         
-        self.duration_var = tk.StringVar(value="5")
+        self.duration_var = tk.StringVar(value="0")
         self.duration_entry = tk.Entry(control_frame, textvariable=self.duration_var, width=5)
         self.duration_entry.pack(side=tk.LEFT, padx=(0, 20))
         
-        self.record_button = tk.Button(control_frame, text="Record", command=self.toggle_recording)
+        self.record_button = tk.Button(control_frame, text="Record", command=self.toggle_recording, state=tk.DISABLED)
         self.record_button.pack(side=tk.LEFT, padx=10)
         
-        self.transcribe_button = tk.Button(control_frame, text="Transcribe", command=self.transcribe_audio, state=tk.DISABLED)
-        self.transcribe_button.pack(side=tk.LEFT, padx=10)
-        
         # Status label
         self.status_var = tk.StringVar()
         self.status_var.set("Loading model...")
@@ -61,6 +71,8 @@ class JavaneseSpeechRecorderApp:
         
         self.result_text = tk.Text(self.root, wrap=tk.WORD, height=15)
         self.result_text.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
+        # Words that may still change while the speaker goes on
+        self.result_text.tag_config("partial", foreground="gray")
         
         # Add scrollbar to text area
         scrollbar = tk.Scrollbar(self.result_text)
@@ -68,44 +80,28 @@ class JavaneseSpeechRecorderApp:
         self.result_text.config(yscrollcommand=scrollbar.set)
         scrollbar.config(command=self.result_text.yview)
     
+    def post(self, callback, *args):
+        """Run callback(*args) on the Tk thread; safe to call from any thread."""
+        self.ui_queue.put((callback, args))
+    
+    def process_ui_queue(self):
+        while True:
+            try:
+                callback, args = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        self.root.after(UI_POLL_MS, self.process_ui_queue)
+    
     def load_model(self):
         try:
-            # Check if CUDA is available
-            device = "cuda:0" if torch.cuda.is_available() else "cpu"
-            torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-            
-            # Model ID on Hugging Face
-            model_id = "bagasshw/whisper-tiny-javanese-openslr-v3"
-            
-            # Load model and processor
-            self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
-                model_id, 
-                torch_dtype=torch_dtype,
-                low_cpu_mem_usage=True,
-                use_safetensors=True
-            )
-            self.model.to(device)
-            
-            self.processor = AutoProcessor.from_pretrained(model_id)
-            
-            # Create pipeline
-            self.pipe = pipeline(
-                "automatic-speech-recognition",
-                model=self.model,
-                tokenizer=self.processor.tokenizer,
-                feature_extractor=self.processor.feature_extractor,
-                max_new_tokens=128,
-                chunk_length_s=30,
-                batch_size=16,
-                return_timestamps=False,
-                torch_dtype=torch_dtype,
-                device=device,
-            )
-            
+            # Load the shared model and run a dummy clip so the first live decode is fast
+            self.entry = warmup(language=DEFAULT_LANGUAGE)
             self.model_loaded = True
-            self.status_var.set("Ready to record")
+            self.post(self.status_var.set, "Ready to record")
+            self.post(self.record_button.config, {"state": tk.NORMAL})
         except Exception as e:
-            self.status_var.set(f"Error loading model: {str(e)}")
+            self.post(self.status_var.set, f"Error loading model: {str(e)}")
     
     def toggle_recording(self):
         if self.is_recording:
@@ -115,89 +111,101 @@ class JavaneseSpeechRecorderApp:
     
     def start_recording(self):
         try:
-            duration = int(self.duration_var.get())
-            if duration <= 0:
-                self.status_var.set("Duration must be positive")
+            duration = float(self.duration_var.get() or 0)
+            if duration < 0:
+                self.status_var.set("Duration cannot be negative")
                 return
         except ValueError:
             self.status_var.set("Invalid duration")
             return
         
+        if not self.model_loaded:
+            self.status_var.set("Model not loaded yet")
+            return
+        
+        # Memory stays bounded however long the session runs
+        self.ring = RingBuffer(RING_SECONDS * SAMPLE_RATE)
+        try:
+            self.stream = sd.InputStream(samplerate=SAMPLE_RATE, channels=1, dtype='float32',
+                                         blocksize=BLOCK_SIZE, callback=self.audio_callback)
+            self.stream.start()
+        except Exception as e:
+            self.stream = None
+            self.status_var.set(f"Error opening microphone: {str(e)}")
+            return
+        
         self.is_recording = True
         self.record_button.config(text="Stop Recording")
-        self.transcribe_button.config(state=tk.DISABLED)
+        self.result_text.delete(1.0, tk.END)
+        self.status_var.set("Recording... text appears as you speak")
+        if duration > 0:
+            self.stop_timer = self.root.after(int(duration * 1000), self.stop_recording)
         
-        # Start recording in a separate thread
-        threading.Thread(target=self.record_audio, args=(duration,), daemon=True).start()
+        # Transcribe in a separate thread while the callback keeps capturing
+        threading.Thread(target=self.transcribe_stream, args=(self.ring,), daemon=True).start()
     
-    def stop_recording(self):
-        self.is_recording = False
-        self.record_button.config(text="Record")
-    
-    def record_audio(self, duration):
-        # Audio recording parameters
-        sample_rate = 16000
-        channels = 1
-        
-        self.status_var.set(f"Recording for {duration} seconds...")
-        
-        # Record audio
-        recording = sd.rec(int(duration * sample_rate), samplerate=sample_rate, channels=channels, dtype='float32')
-        
-        # Wait for recording to complete or until stopped
-        for _ in range(int(duration * 10)):  # Check every 100ms
-            if not self.is_recording:
-                break
-            time.sleep(0.1)
-        
-        # Stop recording if it's still going
-        sd.stop()
-        
-        # Create a temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        temp_file.close()
-        
-        # Save the recorded audio to the temporary file
-        sf.write(temp_file.name, recording, sample_rate)
-        
-        self.audio_path = temp_file.name
-        self.status_var.set("Recording finished")
-        self.record_button.config(text="Record")
-        self.is_recording = False
-        self.transcribe_button.config(state=tk.NORMAL)
+    def audio_callback(self, indata, frames, time_info, status):
+        # Runs on the audio thread: only copy the samples into the ring buffer
+        self.ring.write(indata[:, 0])
     
-    def transcribe_audio(self):
-        if not self.audio_path:
-            self.status_var.set("No recording available")
-            return
-        
-        if not self.model_loaded:
-            self.status_var.set("Model not loaded yet")
+    def stop_recording(self):
+        if not self.is_recording:
             return
-        
-        self.status_var.set("Transcribing... Please wait.")
-        self.transcribe_button.config(state=tk.DISABLED)
-        
-        # Start transcription in a separate thread
-        threading.Thread(target=self.process_transcription, daemon=True).start()
+        self.is_recording = False
+        if self.stop_timer is not None:
+            self.root.after_cancel(self.stop_timer)
+            self.stop_timer = None
+        
+        self.stream.stop()
+        self.stream.close()
+        self.stream = None
+        # Lets the transcription thread drain what is left and finish
+        self.ring.close()
+        
+        self.record_button.config(text="Record", state=tk.DISABLED)
+        self.status_var.set("Finishing transcription...")
     
-    def process_transcription(self):
+    def transcribe_stream(self, ring):
+        def transcribe(audio):
+            # Streaming tails stay well under 30 seconds, so one batched generate call each;
+            # STT_PROFILE_SAMPLE_RATE profiles that fraction of the calls
+            with profiling.maybe_profile("recorder"):
+                return transcribe_batch(self.entry, [audio], DEFAULT_LANGUAGE, token_budget(len(audio) / SAMPLE_RATE))[0]
+        
+        session = StreamingSession(transcribe)
         try:
-            # Perform transcription
-            result = self.pipe(self.audio_path, generate_kwargs={"language": "jw"})
+            while True:
+                closed = ring.closed
+                samples = ring.read(timeout=0.1)
+                if len(samples):
+                    result = session.push(samples)
+                    self.post(self.show_transcript, self.final_text(session), result["partial"], ring.dropped)
+                elif closed:
+                    break
             
-            # Update UI with result
-            self.result_text.delete(1.0, tk.END)
-            self.result_text.insert(tk.END, result["text"])
-            self.status_var.set("Transcription complete")
+            result = session.finish()
+            self.post(self.show_transcript, result["text"], "", ring.dropped)
+            self.post(self.status_var.set, "Transcription complete" if result["text"] else "No speech detected")
         except Exception as e:
-            self.status_var.set(f"Error during transcription: {str(e)}")
-            self.result_text.delete(1.0, tk.END)
-            self.result_text.insert(tk.END, f"Error: {str(e)}")
+            self.post(self.status_var.set, f"Error during transcription: {str(e)}")
         finally:
-            self.transcribe_button.config(state=tk.NORMAL)
+            self.post(self.record_button.config, {"state": tk.NORMAL})
+    
+    @staticmethod
+    def final_text(session):
+        return " ".join(segment["text"] for segment in session.segments)
+    
+    def show_transcript(self, final, partial, dropped):
+        # Finalized segments in black, the still-changing hypothesis in gray
+        self.result_text.delete(1.0, tk.END)
+        self.result_text.insert(tk.END, final)
+        if partial:
+            self.result_text.insert(tk.END, (" " if final else "") + partial, "partial")
+        self.result_text.see(tk.END)
+        if dropped and self.is_recording:
+            self.status_var.set(f"Recording... transcription is behind, skipped {dropped / SAMPLE_RATE:.1f}s of audio")
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = JavaneseSpeechRecorderApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
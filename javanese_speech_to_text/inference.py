@@ -0,0 +1,158 @@
+"""
+Headless inference core: batched generate calls and whole-recording
+transcription. Imports torch and transformers but no audio-device or GUI
+modules, so servers and batch tools can use it on machines without PortAudio.
+"""
+import logging
+import time
+
+import numpy as np
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+import metrics
+import model_registry
+import profiling
+from audio_io import SAMPLE_RATE, load_audio, resample, to_mono
+from batching import CancelledError
+from longform import transcribe_long
+
+logger = logging.getLogger(__name__)
+
+
+class CancelCriteria(StoppingCriteria):
+    """Stops generate() at the next decoding step once cancel_event is set."""
+
+    def __init__(self, cancel_event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.cancel_event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def transcribe_batch(entry, audios, language, max_new_tokens=128, cancel_event=None, timings=None):
+    """
+    Transcribe clips of at most 30 seconds with one batched generate call.
+
+    Args:
+        entry: LoadedModel from the model registry
+        audios: List of 16 kHz float32 arrays
+        language: Whisper language code; None for the default, "jv" is accepted for Javanese
+        max_new_tokens: Decode budget per clip
+        cancel_event: Optional threading.Event; setting it stops generation and
+            raises CancelledError
+        timings: Optional dict that receives the seconds spent in the features,
+            encoder and decoder stages
+
+    Returns:
+        List of transcribed texts
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise CancelledError("Transcription was cancelled")
+    language = model_registry.normalize_language(language)
+
+    # Log-mel features for the whole batch, padded to Whisper's 30 second window
+    start = time.perf_counter()
+    with profiling.stage("features"):
+        features, attention_mask = entry.frontend(audios)
+        features = features.to(entry.device, dtype=entry.torch_dtype)
+        attention_mask = attention_mask.to(entry.device)
+    stages = {"features": time.perf_counter() - start}
+
+    kwargs = {}
+    if cancel_event is not None:
+        kwargs["stopping_criteria"] = StoppingCriteriaList([CancelCriteria(cancel_event)])
+
+    metrics.reset_encoder_time()
+    start = time.perf_counter()
+    with profiling.stage("generate"), torch.inference_mode():
+        tokens = entry.model.generate(
+            features,
+            attention_mask=attention_mask,
+            generation_config=entry.generation_config(max_new_tokens=max_new_tokens),
+            language=language,
+            **kwargs,
+        )
+    # Without encoder hooks (ONNX Runtime) all of generate counts as decoder time
+    stages["encoder"] = metrics.encoder_time()
+    stages["decoder"] = time.perf_counter() - start - stages["encoder"]
+    metrics.observe_stages(stages)
+    profiling.record_stages({"encoder": stages["encoder"], "decoder": stages["decoder"]})
+    if timings is not None:
+        timings.update(stages)
+
+    if cancel_event is not None and cancel_event.is_set():
+        raise CancelledError("Transcription was cancelled")
+    with profiling.stage("detokenize"):
+        return entry.processor.tokenizer.batch_decode(tokens, skip_special_tokens=True)
+
+
+def transcribe_audio(audio, sampling_rate=SAMPLE_RATE, use_vad=True, language=None, batch_size=8,
+                     backend=None, torch_dtype=None, model=None):
+    """
+    Transcribe Javanese audio to text using the whisper-tiny-javanese model.
+
+    Recordings of any length are split into 30 second chunks (overlapping
+    windows where speech runs on), batched by length and decoded with a token
+    budget that fits each batch, then stitched back together.
+
+    Set STT_PROFILE_SAMPLE_RATE=1 to write a torch.profiler trace of every call
+    to STT_PROFILE_DIR.
+
+    Args:
+        audio: Path to an audio file, encoded audio bytes, or a float32 NumPy array
+        sampling_rate: Sample rate of audio when it is passed as an array
+        use_vad: Only pass detected speech to the model, skipping silence
+        language: Whisper language code (defaults to STT_LANGUAGE or "jw")
+        batch_size: Chunks per generate call
+        backend: Inference backend (defaults to STT_BACKEND or "eager")
+        torch_dtype: Model dtype (defaults to float16 on CUDA, float32 on CPU)
+        model: Model name from STT_MODELS_DIR, or a Hugging Face ID or local path
+            (defaults to STT_MODEL_ID)
+
+    Returns:
+        Transcribed text
+    """
+    # Reuse the process-wide model instead of loading it per call
+    entry = model_registry.get_model(model_registry.resolve(model, allow_ids=True), backend=backend,
+                                     torch_dtype=torch_dtype)
+
+    with profiling.maybe_profile("transcribe_audio") as profile:
+        # Decode in memory; the model gets raw samples instead of a file to re-open
+        with profiling.stage("decode"):
+            if isinstance(audio, np.ndarray):
+                audio = resample(to_mono(audio), sampling_rate)
+            else:
+                audio = load_audio(audio)
+
+        # Without VAD the whole recording is treated as one stretch of speech
+        segments = None if use_vad else [(0, len(audio))]
+
+        def transcribe_many(chunks, max_new_tokens):
+            return transcribe_batch(entry, chunks, language, max_new_tokens)
+
+        text, _ = transcribe_long(audio, transcribe_many, segments=segments, batch_size=batch_size)
+
+    if profile is not None and not profile.skipped:
+        # Servers and GUIs call this too, so the path is logged rather than printed
+        logger.info("Profile written to %s", profile.trace_path)
+    return text
+
+
+def warmup(model_id=None, language=None, backend=None):
+    """
+    Load a model and run a dummy clip through both inference paths.
+
+    The ASR pipeline (long uploads, GUIs) and transcribe_batch() (batched
+    requests) each pay for lazy allocations on their first call, so a server
+    runs this before it reports ready.
+
+    Returns:
+        LoadedModel instance
+    """
+    language = model_registry.normalize_language(language)
+    entry = model_registry.warmup(model_id, language=language, backend=backend)
+    # Low-level noise rather than silence, so the decoder runs a few real steps
+    clip = np.random.default_rng(0).normal(0, 0.01, SAMPLE_RATE).astype(np.float32)
+    transcribe_batch(entry, [clip], language, max_new_tokens=8)
+    return entry
@@ -0,0 +1,236 @@
+import itertools
+import queue
+import threading
+import time
+import uuid
+
+from batching import CancelledError
+from longform import group_segments, plan_chunks
+from vad import SAMPLE_RATE
+
+# Priorities: lower runs first
+PRIORITY_LIVE = 0
+PRIORITY_BULK = 1
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue is full; retry_after estimates when to try again."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, audio, priority):
+        self.id = uuid.uuid4().hex
+        self.audio = audio
+        self.audio_seconds = len(audio) / SAMPLE_RATE
+        self.priority = priority
+        self.status = "queued"
+        self.progress = 0.0
+        self.segments = []
+        self.text = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    def to_dict(self):
+        job = {
+            "id": self.id,
+            "status": self.status,
+            "priority": "live" if self.priority == PRIORITY_LIVE else "bulk",
+            "progress": round(self.progress, 3),
+            "audio_seconds": round(self.audio_seconds, 2),
+            "segments": list(self.segments),
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.text is not None:
+            job["transcription"] = self.text
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+
+class JobManager:
+    """
+    Bounded priority queue of transcription jobs run by background threads.
+
+    Short clips are queued ahead of bulk uploads. Each job is split into
+    speech chunks and transcribed a few chunks at a time, so progress and
+    partial segments are visible while it runs and a cancelled job stops at
+    the next decoding step.
+    """
+
+    def __init__(self, transcribe_fn, max_queued=32, runners=1, live_max_seconds=30.0,
+                 chunks_per_step=4, retention_s=3600.0):
+        """
+        Args:
+            transcribe_fn: Callable (audios, cancel_event) -> texts for clips of at most 30 seconds
+            max_queued: Jobs allowed to wait before submit() raises JobQueueFullError
+            runners: Number of jobs processed at the same time
+            live_max_seconds: Clips up to this length get live priority by default
+            chunks_per_step: Speech chunks transcribed per batch between progress updates
+            retention_s: How long finished jobs stay available
+        """
+        self.transcribe_fn = transcribe_fn
+        self.max_queued = max_queued
+        self.runners = runners
+        self.live_max_seconds = live_max_seconds
+        self.chunks_per_step = chunks_per_step
+        self.retention_s = retention_s
+
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._threads = []
+        # Recent processing speed (seconds of work per second of audio), used for Retry-After
+        self._real_time_factor = 0.2
+
+    def start(self):
+        with self._lock:
+            while len(self._threads) < self.runners:
+                thread = threading.Thread(target=self._run, name=f"job-runner-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def submit(self, audio, priority=None):
+        """
+        Queue audio for transcription.
+
+        Args:
+            audio: 16 kHz float32 array
+            priority: "live" or "bulk"; by default clips up to live_max_seconds are live
+
+        Returns:
+            The queued Job
+        """
+        if priority is None:
+            priority = "live" if len(audio) <= self.live_max_seconds * SAMPLE_RATE else "bulk"
+        if priority not in ("live", "bulk"):
+            raise ValueError("priority must be 'live' or 'bulk'")
+
+        self.start()
+        job = Job(audio, PRIORITY_LIVE if priority == "live" else PRIORITY_BULK)
+        with self._lock:
+            self._expire()
+            if self._queued >= self.max_queued:
+                raise JobQueueFullError(
+                    f"Job queue is full ({self.max_queued} jobs waiting)",
+                    retry_after=self._estimate_wait(),
+                )
+            self._queued += 1
+            self._jobs[job.id] = job
+        self._queue.put((job.priority, next(self._counter), job))
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job or None if unknown."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        # Running jobs notice the event at their next decoding step
+        job.cancel_event.set()
+        with self._lock:
+            if job.status == "queued":
+                self._queued -= 1
+                job.status = "cancelled"
+                job.finished = time.time()
+                job.audio = None
+        return job
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {
+                "queued": self._queued,
+                "max_queued": self.max_queued,
+                "runners": self.runners,
+                "jobs": statuses,
+                "real_time_factor": round(self._real_time_factor, 4),
+            }
+
+    def _estimate_wait(self):
+        # Work ahead of a new job, spread over the runners
+        pending = sum(j.audio_seconds * (1 - j.progress) for j in self._jobs.values()
+                      if j.status in ("queued", "running"))
+        return max(1, int(pending * self._real_time_factor / self.runners) + 1)
+
+    def _expire(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and now - job.finished > self.retention_s]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _finish(self, job, status, error=None):
+        with self._lock:
+            if job.finished is not None:
+                return
+            if job.status == "queued":
+                self._queued -= 1
+            job.status = status
+            job.error = error
+            job.finished = time.time()
+            job.audio = None
+
+    def _run(self):
+        while True:
+            _, _, job = self._queue.get()
+            with self._lock:
+                if job.status != "queued":
+                    continue
+                self._queued -= 1
+                job.status = "running"
+                job.started = time.time()
+
+            try:
+                self._process(job)
+            except CancelledError:
+                self._finish(job, "cancelled")
+            except Exception as e:
+                self._finish(job, "failed", str(e))
+
+    def _process(self, job):
+        start = time.perf_counter()
+        groups = plan_chunks(job.audio)
+
+        # Windows of one long stretch of speech are stitched together, so they share a step
+        steps = []
+        for group in groups:
+            if not steps or sum(map(len, steps[-1])) + len(group) > self.chunks_per_step:
+                steps.append([])
+            steps[-1].append(group)
+
+        total = sum(map(len, groups))
+        done = 0
+        for step in steps:
+            if job.cancel_event.is_set():
+                raise CancelledError("Job was cancelled")
+            chunks = [chunk for group in step for chunk in group]
+            texts = self.transcribe_fn([chunk.audio for chunk in chunks], job.cancel_event)
+            job.segments.extend(group_segments(step, texts))
+            done += len(chunks)
+            job.progress = min(1.0, done / total)
+
+        job.text = " ".join(s["text"] for s in job.segments if s["text"])
+        job.progress = 1.0
+        if job.audio_seconds:
+            rtf = (time.perf_counter() - start) / job.audio_seconds
+            self._real_time_factor = 0.8 * self._real_time_factor + 0.2 * rtf
+        self._finish(job, "completed")
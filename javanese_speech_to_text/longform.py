@@ -0,0 +1,252 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from vad import MAX_CHUNK_SECONDS, SAMPLE_RATE, SpeechChunk, detect_speech, pack_segments
+
+# Overlap between consecutive windows of speech that runs longer than one chunk
+OVERLAP_SECONDS = 4
+
+# Decode budget: a floor for the task/timestamp tokens plus a generous rate
+# for Javanese speech, capped by the model's usual limit
+MIN_NEW_TOKENS = 16
+TOKENS_PER_SECOND = 8
+MAX_NEW_TOKENS = 128
+
+
+def token_budget(seconds, tokens_per_second=TOKENS_PER_SECOND, max_new_tokens=MAX_NEW_TOKENS):
+    """Decoder steps needed for a clip of the given length."""
+    return min(max_new_tokens, MIN_NEW_TOKENS + math.ceil(seconds * tokens_per_second))
+
+
+def split_windows(start, end, sampling_rate=SAMPLE_RATE, chunk_s=MAX_CHUNK_SECONDS, overlap_s=OVERLAP_SECONDS):
+    """
+    Split one stretch of speech into evenly sized, overlapping windows.
+
+    Args:
+        start, end: Sample range on the original recording
+
+    Returns:
+        List of (start, end) sample ranges; a single range if it already fits one chunk
+    """
+    chunk = int(chunk_s * sampling_rate)
+    overlap = int(overlap_s * sampling_rate)
+    length = end - start
+    if length <= chunk:
+        return [(start, end)]
+
+    count = math.ceil((length - overlap) / (chunk - overlap))
+    window = math.ceil((length + (count - 1) * overlap) / count)
+    step = window - overlap
+    return [(start + i * step, min(end, start + i * step + window)) for i in range(count)]
+
+
+def plan_chunks(audio, segments=None, sampling_rate=SAMPLE_RATE, chunk_s=MAX_CHUNK_SECONDS, overlap_s=OVERLAP_SECONDS):
+    """
+    Turn a recording into groups of model-sized chunks.
+
+    Short speech segments are packed together as in pack_segments(). A
+    segment longer than one chunk becomes a group of overlapping windows whose
+    transcripts are stitched back together with stitch().
+
+    Args:
+        audio: 1-D float32 array
+        segments: (start, end) sample ranges to transcribe; detected with VAD when None
+
+    Returns:
+        List of groups in time order; each group is a list of SpeechChunk
+    """
+    if segments is None:
+        segments = detect_speech(audio, sampling_rate)
+    chunk = int(chunk_s * sampling_rate)
+
+    groups = []
+    short = []
+    for start, end in segments:
+        if end - start <= chunk:
+            short.append((start, end))
+            continue
+        # Flush the short segments before this one so groups stay in time order
+        groups.extend([c] for c in pack_segments(audio, short, sampling_rate, chunk_s))
+        short = []
+        groups.append([
+            SpeechChunk(np.asarray(audio[s:e], dtype=np.float32), [(0, s, e - s)], sampling_rate)
+            for s, e in split_windows(start, end, sampling_rate, chunk_s, overlap_s)
+        ])
+    groups.extend([c] for c in pack_segments(audio, short, sampling_rate, chunk_s))
+    return groups
+
+
+def _longest_common_run(left, right):
+    # Longest run of identical words; ties go to the earliest position in right, then in left
+    best = (0, 0, 0)
+    previous = [0] * (len(right) + 1)
+    for i in range(1, len(left) + 1):
+        current = [0] * (len(right) + 1)
+        for j in range(1, len(right) + 1):
+            if left[i - 1] == right[j - 1]:
+                current[j] = previous[j - 1] + 1
+                run = current[j]
+                candidate = (run, i - run, j - run)
+                if run > best[0] or (run == best[0] and (candidate[2], candidate[1]) < (best[2], best[1])):
+                    best = candidate
+        previous = current
+    return best
+
+
+def _merge(left, right, left_seconds, right_seconds, overlap_seconds, min_match=2):
+    # Roughly how many words each side spoke during the overlap, with some slack
+    left_overlap = len(left) * overlap_seconds / left_seconds if left_seconds else 0
+    right_overlap = len(right) * overlap_seconds / right_seconds if right_seconds else 0
+    tail_start = max(0, len(left) - math.ceil(1.5 * left_overlap) - 2)
+    head = right[:math.ceil(1.5 * right_overlap) + 2]
+
+    run, i, j = _longest_common_run(left[tail_start:], head)
+    if run >= min(min_match, len(head)) and run > 0:
+        # Join on the shared words: keep the left side up to them and the right side from them
+        return left[:tail_start + i] + right[j:]
+
+    # No agreement: cut both transcripts at the middle of the overlap
+    keep_left = len(left) - int(round(left_overlap / 2))
+    skip_right = int(round(right_overlap / 2))
+    return left[:keep_left] + right[skip_right:]
+
+
+def stitch(group, texts):
+    """
+    Join the transcripts of overlapping windows into one text.
+
+    Consecutive windows are merged on the longest run of words they share in
+    the overlap; when they share none, each side keeps the words from its half
+    of the overlap. The result depends only on the inputs.
+
+    Args:
+        group: SpeechChunk windows from plan_chunks()
+        texts: Transcript of each window
+
+    Returns:
+        The stitched text
+    """
+    words = texts[0].split()
+    for previous, chunk, text in zip(group, group[1:], texts[1:]):
+        overlap = max(0.0, previous.end - chunk.start)
+        words = _merge(
+            words, text.split(),
+            len(previous.audio) / previous.sampling_rate,
+            len(chunk.audio) / chunk.sampling_rate,
+            overlap,
+        )
+    return " ".join(words)
+
+
+def bucket_batches(chunks, batch_size, sampling_rate=SAMPLE_RATE, tokens_per_second=TOKENS_PER_SECOND,
+                   max_new_tokens=MAX_NEW_TOKENS):
+    """
+    Group chunks of similar speech length into batches.
+
+    Returns:
+        List of (indices into chunks, max_new_tokens for the batch)
+    """
+    order = sorted(range(len(chunks)), key=lambda i: len(chunks[i].audio), reverse=True)
+    batches = []
+    for i in range(0, len(order), batch_size):
+        indices = order[i:i + batch_size]
+        # Sorted longest first, so the first chunk sets the batch's budget
+        seconds = len(chunks[indices[0]].audio) / sampling_rate
+        batches.append((indices, token_budget(seconds, tokens_per_second, max_new_tokens)))
+    return batches
+
+
+def transcribe_long(audio, transcribe_fn, sampling_rate=SAMPLE_RATE, segments=None, batch_size=8,
+                    max_parallel=1, chunk_s=MAX_CHUNK_SECONDS, overlap_s=OVERLAP_SECONDS,
+                    tokens_per_second=TOKENS_PER_SECOND, max_new_tokens=MAX_NEW_TOKENS):
+    """
+    Transcribe a recording of any length.
+
+    Speech is split into chunks (overlapping windows for long stretches of
+    speech), chunks of similar length are batched together, each batch decodes
+    with a token budget sized for its longest chunk, and window transcripts are
+    stitched back together.
+
+    Args:
+        audio: 1-D float32 array at sampling_rate
+        transcribe_fn: Callable (audios, max_new_tokens) -> texts for clips of at most chunk_s seconds
+        segments: (start, end) sample ranges to transcribe; detected with VAD when None
+        batch_size: Chunks per transcribe_fn call
+        max_parallel: Batches run at the same time (e.g. one per inference worker)
+
+    Returns:
+        Tuple of (full text, list of {"start", "end", "text"} segments on the original timeline)
+    """
+    groups = plan_chunks(audio, segments, sampling_rate, chunk_s, overlap_s)
+    chunks = [chunk for group in groups for chunk in group]
+    if not chunks:
+        return "", []
+
+    batches = bucket_batches(chunks, batch_size, sampling_rate, tokens_per_second, max_new_tokens)
+
+    def run(batch):
+        indices, budget = batch
+        return indices, transcribe_fn([chunks[i].audio for i in indices], budget)
+
+    texts = [None] * len(chunks)
+    if max_parallel > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(min(max_parallel, len(batches))) as executor:
+            results = list(executor.map(run, batches))
+    else:
+        results = [run(batch) for batch in batches]
+    for indices, batch_texts in results:
+        for i, text in zip(indices, batch_texts):
+            texts[i] = text
+
+    segments = group_segments(groups, texts)
+    return " ".join(s["text"] for s in segments if s["text"]), segments
+
+
+def transcribe_chunked(audio, transcribe_many, sampling_rate=SAMPLE_RATE, segments=None,
+                       chunk_s=MAX_CHUNK_SECONDS, overlap_s=OVERLAP_SECONDS):
+    """
+    Transcribe a recording of any length, handing every chunk over in one call.
+
+    Chunks are planned and stitched as in transcribe_long(), but batching and
+    the decode budget are left to transcribe_many, e.g. the API's micro-batcher.
+    Fully silent recordings return immediately without calling the model.
+
+    Args:
+        audio: 1-D float32 array at sampling_rate
+        transcribe_many: Callable taking a list of arrays of at most chunk_s seconds and returning their texts
+        segments: (start, end) sample ranges to transcribe; detected with VAD when None
+
+    Returns:
+        Tuple of (full text, list of {"start", "end", "text"} segments on the original timeline)
+    """
+    groups = plan_chunks(audio, segments, sampling_rate, chunk_s, overlap_s)
+    chunks = [chunk for group in groups for chunk in group]
+    if not chunks:
+        return "", []
+
+    segments = group_segments(groups, transcribe_many([chunk.audio for chunk in chunks]))
+    return " ".join(s["text"] for s in segments if s["text"]), segments
+
+
+def group_segments(groups, texts):
+    """
+    Turn the transcripts of planned chunks into segments, stitching overlapping windows.
+
+    Args:
+        groups: Groups from plan_chunks()
+        texts: Transcript of each chunk, in the order of the flattened groups
+
+    Returns:
+        List of {"start", "end", "text"} segments, one per group
+    """
+    texts = [text.strip() for text in texts]
+    segments = []
+    position = 0
+    for group in groups:
+        group_texts = texts[position:position + len(group)]
+        position += len(group)
+        text = stitch(group, group_texts) if len(group) > 1 else group_texts[0]
+        segments.append({"start": group[0].start, "end": group[-1].end, "text": text})
+    return segments
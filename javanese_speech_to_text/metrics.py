@@ -0,0 +1,281 @@
+import bisect
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from a few milliseconds up to long uploads
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Processing seconds per second of audio
+RTF_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _label_values(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing total."""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values.items()]
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down.
+
+    Either set it directly, or give it a callback that is read at scrape time
+    and returns a number or a dict of {label values tuple: number}.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        if self.callback is not None:
+            try:
+                values = self.callback()
+            except Exception:
+                # A failing collector must not break the whole scrape
+                return []
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in values.items()]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (non-cumulative), plus sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        lines = []
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "stt_stage_seconds",
+    "Time spent in each transcription stage (decode, resample, features, encoder, decoder, total).",
+    ["stage"],
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "stt_request_seconds",
+    "HTTP request latency by endpoint and status code.",
+    ["endpoint", "status"],
+))
+REAL_TIME_FACTOR = REGISTRY.register(Histogram(
+    "stt_real_time_factor",
+    "Processing seconds per second of audio for transcribed requests.",
+    buckets=RTF_BUCKETS,
+))
+DECODE_SECONDS = REGISTRY.register(Histogram(
+    "stt_decode_seconds",
+    "Time to decode and resample an upload, by decoder (wav, soundfile, ffmpeg, pcm).",
+    ["decoder"],
+))
+ADMISSION_DECISIONS = REGISTRY.register(Counter(
+    "stt_admission_decisions_total",
+    "Transcription requests by admission decision (full, degraded, shed).",
+    ["decision"],
+))
+AUDIO_SECONDS = REGISTRY.register(Counter(
+    "stt_audio_seconds_total",
+    "Seconds of audio transcribed.",
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "stt_in_flight_requests",
+    "HTTP requests currently being handled.",
+))
+CANCELLED_REQUESTS = REGISTRY.register(Counter(
+    "stt_cancelled_requests_total",
+    "Requests abandoned before they finished, by reason (disconnect, timeout).",
+    ["reason"],
+))
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # No procfs: fall back to the peak (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+REGISTRY.register(Gauge(
+    "stt_process_resident_memory_bytes",
+    "Resident memory of the serving process.",
+    callback=_rss_bytes,
+))
+
+
+# Encoder time of the current thread's generate call, accumulated by forward hooks
+_encoder_timing = threading.local()
+
+
+def _encoder_pre_hook(module, args):
+    _encoder_timing.start = time.perf_counter()
+
+
+def _encoder_post_hook(module, args, output):
+    start = getattr(_encoder_timing, "start", None)
+    if start is not None:
+        _encoder_timing.seconds = getattr(_encoder_timing, "seconds", 0.0) + time.perf_counter() - start
+        _encoder_timing.start = None
+
+
+def instrument_encoder(model):
+    """
+    Time the model's encoder with forward hooks so generate() can be split
+    into encoder and decoder time.
+
+    Returns:
+        False if the model has no torch encoder to hook (e.g. ONNX Runtime)
+    """
+    get_encoder = getattr(model, "get_encoder", None)
+    encoder = get_encoder() if get_encoder is not None else None
+    if not hasattr(encoder, "register_forward_hook"):
+        return False
+    encoder.register_forward_pre_hook(_encoder_pre_hook)
+    encoder.register_forward_hook(_encoder_post_hook)
+    return True
+
+
+def reset_encoder_time():
+    _encoder_timing.seconds = 0.0
+    _encoder_timing.start = None
+
+
+def encoder_time():
+    """Encoder seconds on this thread since the last reset_encoder_time()."""
+    return getattr(_encoder_timing, "seconds", 0.0)
+
+
+def observe_stages(timings):
+    """Record a dict of {stage: seconds}, e.g. timings reported by a worker process."""
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
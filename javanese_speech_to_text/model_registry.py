@@ -0,0 +1,373 @@
+import copy
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+# torch, transformers and backends are imported on first use, so importing
+# the registry (e.g. in the API server before it starts listening) is cheap.
+
+# Model ID on Hugging Face (can be overridden with a local checkpoint directory)
+DEFAULT_MODEL_ID = os.environ.get("STT_MODEL_ID", "bagasshw/whisper-tiny-javanese-openslr-v3")
+
+# Named local checkpoints: <STT_MODELS_DIR>/<name>/ is either a checkpoint itself or holds
+# one subdirectory per version of it (e.g. models/tiny/v1, models/tiny/v2)
+MODELS_DIR = os.environ.get("STT_MODELS_DIR", "models")
+
+# RAM budget for loaded models in megabytes; beyond it the least recently used are unloaded (0: no limit)
+MEMORY_BUDGET_MB = float(os.environ.get("STT_MODEL_MEMORY_MB", 0))
+
+# Whisper's language code for Javanese is "jw", not the ISO 639-1 "jv"
+DEFAULT_LANGUAGE = os.environ.get("STT_LANGUAGE", "jw")
+LANGUAGE_ALIASES = {"jv": "jw", "javanese": "jw"}
+
+# Loaded models keyed by (model_id, device, dtype, backend), least recently used first
+_models = OrderedDict()
+_models_lock = threading.Lock()
+_load_locks = {}
+
+# Checkpoint version each model name is served from, fixed on first use and changed by swap()
+_active_versions = {}
+
+
+class UnknownModelError(ValueError):
+    """Raised when a model name matches no checkpoint in MODELS_DIR."""
+
+
+class LoadedModel:
+    """A model, its processor, the ASR pipeline built around them and a batched feature frontend."""
+
+    def __init__(self, model_id, device, torch_dtype, backend, model, processor, pipe, load_seconds, frontend=None):
+        self.model_id = model_id
+        self.device = device
+        self.torch_dtype = torch_dtype
+        self.backend = backend
+        self.model = model
+        self.processor = processor
+        self.pipe = pipe
+        self.load_seconds = load_seconds
+        self.frontend = frontend
+        self.memory_bytes = _model_bytes(model)
+
+    def generation_config(self, **overrides):
+        """
+        Return a copy of the pipeline's generation config with overrides applied.
+
+        Direct generate calls use this so they decode exactly like the pipeline.
+        """
+        config = copy.deepcopy(getattr(self.pipe, "generation_config", None) or self.model.generation_config)
+        for name, value in overrides.items():
+            setattr(config, name, value)
+        return config
+
+
+def _model_bytes(model):
+    """Memory held by a model's weights, 0 when they are not torch tensors (e.g. ONNX Runtime)."""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+    except (AttributeError, TypeError):
+        return 0
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def normalize_language(language=None):
+    """Whisper language code for language (DEFAULT_LANGUAGE when empty); "jv" becomes "jw"."""
+    if not language:
+        return DEFAULT_LANGUAGE
+    language = language.strip().lower()
+    return LANGUAGE_ALIASES.get(language, language)
+
+
+def _is_checkpoint(path):
+    return os.path.isfile(os.path.join(path, "config.json"))
+
+
+def _natural_key(name):
+    # v10 sorts after v9
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def list_versions(name):
+    """Checkpoint directories of a named model, oldest first."""
+    if not name or name.startswith(".") or "/" in name or os.sep in name:
+        return []
+    directory = os.path.join(MODELS_DIR, name)
+    if _is_checkpoint(directory):
+        return [directory]
+    if not os.path.isdir(directory):
+        return []
+    versions = [os.path.join(directory, version) for version in sorted(os.listdir(directory), key=_natural_key)]
+    return [version for version in versions if _is_checkpoint(version)]
+
+
+def available_models():
+    """Names of the models in MODELS_DIR with the version each is served from."""
+    if not os.path.isdir(MODELS_DIR):
+        return {}
+    models = {}
+    for name in sorted(os.listdir(MODELS_DIR)):
+        versions = list_versions(name)
+        if versions:
+            with _models_lock:
+                active = _active_versions.get(name)
+            models[name] = {
+                "versions": [os.path.basename(v) for v in versions],
+                "active": os.path.basename(active) if active else None,
+            }
+    return models
+
+
+def resolve(model=None, allow_ids=False):
+    """
+    Model ID to load for a model name.
+
+    A name is served from one version until swap() moves it to another, so a
+    new version copied into MODELS_DIR is only picked up when it is swapped in.
+
+    Args:
+        model: None or "default" for DEFAULT_MODEL_ID, or a name from MODELS_DIR
+        allow_ids: Also accept Hugging Face IDs and paths (never for names sent by clients)
+
+    Returns:
+        Model ID or checkpoint directory to pass to get_model()
+    """
+    if not model or model == "default":
+        return DEFAULT_MODEL_ID
+    with _models_lock:
+        active = _active_versions.get(model)
+        if active:
+            return active
+        versions = list_versions(model)
+        if versions:
+            return _active_versions.setdefault(model, versions[-1])
+    if allow_ids:
+        return model
+    raise UnknownModelError(f"Unknown model '{model}'. Available: {', '.join(available_models()) or 'none'}")
+
+
+def default_device():
+    """Return the device models are loaded on when none is requested."""
+    import torch
+    return "cuda:0" if torch.cuda.is_available() else "cpu"
+
+
+def default_dtype(device=None):
+    """Return the dtype models are loaded with on the given device."""
+    import torch
+    device = device or default_device()
+    return torch.float16 if device.startswith("cuda") else torch.float32
+
+
+def _load(model_id, device, torch_dtype, backend):
+    from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+
+    import backends
+    from frontend import LogMelFrontend
+
+    start = time.perf_counter()
+
+    # Load model and processor
+    if backend == "onnx":
+        model = backends.load_onnx_model(model_id)
+        model.to(device)
+    else:
+        model = AutoModelForSpeechSeq2Seq.from_pretrained(
+            model_id,
+            torch_dtype=torch_dtype,
+            low_cpu_mem_usage=True,
+            use_safetensors=True
+        )
+        model.to(device)
+        model.eval()
+        model = backends.apply_backend(model, backend)
+
+    # Lets transcribe_batch() split generate time into encoder and decoder time
+    metrics.instrument_encoder(model)
+
+    processor = AutoProcessor.from_pretrained(model_id)
+
+    # Create pipeline
+    pipe = pipeline(
+        "automatic-speech-recognition",
+        model=model,
+        tokenizer=processor.tokenizer,
+        feature_extractor=processor.feature_extractor,
+        max_new_tokens=128,
+        chunk_length_s=30,
+        batch_size=16,
+        return_timestamps=False,
+        torch_dtype=torch_dtype,
+        device=device,
+    )
+
+    # Same features as processor.feature_extractor, computed for a whole batch at once
+    frontend = LogMelFrontend(processor.feature_extractor, device)
+
+    return LoadedModel(model_id, device, torch_dtype, backend, model, processor, pipe,
+                       time.perf_counter() - start, frontend)
+
+
+def _key(model_id, device, torch_dtype, backend):
+    import backends
+    device = device or default_device()
+    torch_dtype = torch_dtype or default_dtype(device)
+    return (model_id or DEFAULT_MODEL_ID, device, torch_dtype, backend or backends.DEFAULT_BACKEND)
+
+
+def get_model(model_id=None, device=None, torch_dtype=None, backend=None):
+    """
+    Return the loaded model for the given settings, loading it on first use.
+
+    Loading happens once per process for each (model_id, device, dtype, backend)
+    combination. Concurrent callers asking for the same model wait for the
+    first load instead of loading it again.
+
+    Args:
+        model_id: Hugging Face model ID or local directory (defaults to DEFAULT_MODEL_ID)
+        device: Torch device string (defaults to CUDA when available)
+        torch_dtype: Torch dtype (defaults to float16 on CUDA, float32 on CPU)
+        backend: Inference backend from backends.BACKENDS (defaults to STT_BACKEND or "eager")
+
+    Returns:
+        LoadedModel instance
+    """
+    key = _key(model_id, device, torch_dtype, backend)
+
+    with _models_lock:
+        entry = _models.get(key)
+        if entry is not None:
+            _models.move_to_end(key)
+            return entry
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    # Per-key lock so loading one model does not block lookups of another
+    with load_lock:
+        with _models_lock:
+            entry = _models.get(key)
+            if entry is None:
+                # Make room first, so the budget is not exceeded while both are in memory
+                _evict(incoming=_checkpoint_bytes(key[0]))
+        if entry is None:
+            entry = _load(*key)
+            with _models_lock:
+                _models[key] = entry
+                _evict(keep=key)
+    return entry
+
+
+def _checkpoint_bytes(model_id):
+    """Size of a local checkpoint's weight files, as an estimate of its memory before it is loaded."""
+    if not os.path.isdir(model_id):
+        return 0
+    return sum(
+        os.path.getsize(os.path.join(model_id, name))
+        for name in os.listdir(model_id)
+        if name.endswith((".safetensors", ".bin", ".onnx"))
+    )
+
+
+def _evict(keep=None, incoming=0):
+    """
+    Unload least recently used models until the rest, plus incoming bytes about
+    to be loaded, fit in MEMORY_BUDGET_MB.
+
+    Requests that are still using an unloaded model hold their own reference,
+    so they finish normally; its memory is freed when the last one is done.
+    Called with _models_lock held.
+    """
+    if MEMORY_BUDGET_MB <= 0:
+        return
+    budget = MEMORY_BUDGET_MB * 1024 * 1024
+    while _models and sum(entry.memory_bytes for entry in _models.values()) + incoming > budget:
+        oldest = next(iter(_models))
+        if oldest == keep:
+            break
+        del _models[oldest]
+        _load_locks.pop(oldest, None)
+
+
+def get_pipeline(model_id=None, device=None, torch_dtype=None, backend=None):
+    """Return the shared ASR pipeline for the given settings."""
+    return get_model(model_id, device, torch_dtype, backend).pipe
+
+
+def is_loaded(model_id=None, device=None, torch_dtype=None, backend=None):
+    """Check whether a model has already been loaded without loading it."""
+    return _key(model_id, device, torch_dtype, backend) in _models
+
+
+def loaded_models():
+    """Return the LoadedModel entries loaded so far."""
+    with _models_lock:
+        return list(_models.values())
+
+
+def swap(name, version=None, device=None, torch_dtype=None, backend=None):
+    """
+    Move a model name to another checkpoint version without dropping requests.
+
+    The new version is loaded and warmed up while the old one keeps serving;
+    then new requests for the name go to the new version. Requests already
+    running hold the old entry and finish on it; the old entry is unloaded
+    from the registry and freed once they are done.
+
+    Args:
+        name: Model name in MODELS_DIR
+        version: Version directory name (defaults to the newest)
+
+    Returns:
+        LoadedModel of the version now serving the name
+    """
+    versions = list_versions(name)
+    if version is not None:
+        versions = [v for v in versions if os.path.basename(v) == version]
+    if not versions:
+        raise UnknownModelError(f"No checkpoint for model '{name}'" + (f" version '{version}'" if version else ""))
+    path = versions[-1]
+
+    entry = warmup(path, device, torch_dtype, backend=backend)
+    with _models_lock:
+        previous = _active_versions.get(name)
+        _active_versions[name] = path
+        if previous and previous != path:
+            for key in [key for key in _models if key[0] == previous]:
+                del _models[key]
+                _load_locks.pop(key, None)
+    return entry
+
+
+def warmup(model_id=None, device=None, torch_dtype=None, language=DEFAULT_LANGUAGE, backend=None):
+    """
+    Load a model and run one second of silence through it.
+
+    The first inference call pays for lazy allocations inside torch and the
+    pipeline, so running it at startup keeps that cost off the first request.
+
+    Returns:
+        LoadedModel instance
+    """
+    entry = get_model(model_id, device, torch_dtype, backend)
+    silence = np.zeros(16000, dtype=np.float32)
+    entry.pipe({"raw": silence, "sampling_rate": 16000}, generate_kwargs={"language": normalize_language(language)})
+    return entry
+
+
+def clear():
+    """Drop all loaded models (mainly useful for tests and reloading)."""
+    with _models_lock:
+        _models.clear()
+        _load_locks.clear()
+        _active_versions.clear()
+
+
+metrics.REGISTRY.register(metrics.Gauge(
+    "stt_model_memory_bytes",
+    "Memory held by the weights of each loaded model.",
+    ["model_id", "backend"],
+    callback=lambda: {(entry.model_id, entry.backend): entry.memory_bytes for entry in loaded_models()},
+))
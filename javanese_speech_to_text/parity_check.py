@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import inference
+import model_registry
+from audio_io import load_audio
+from backends import BACKENDS
+from batch_transcribe import AUDIO_EXTENSIONS, find_inputs
+from frontend import max_feature_error
+from longform import transcribe_long
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance between two transcripts."""
+    ref = reference.split()
+    hyp = hypothesis.split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1]
+
+
+def wer(references, hypotheses):
+    """Corpus word error rate of hypotheses against references."""
+    errors = sum(word_errors(r, h) for r, h in zip(references, hypotheses))
+    words = sum(len(r.split()) for r in references)
+    return errors / words if words else float(errors > 0)
+
+
+def transcribe_all(backend, audios, language):
+    """
+    Transcribe every clip with one backend; returns (texts, load seconds, inference seconds).
+
+    Clips go through inference.transcribe_batch, the path the server and batch
+    tool use, so a backend that breaks batched generate fails the check. The
+    whole clip is transcribed (no VAD), split into 30 second windows when longer.
+    """
+    entry = model_registry.get_model(backend=backend)
+
+    def transcribe_many(chunks, max_new_tokens):
+        return inference.transcribe_batch(entry, chunks, language, max_new_tokens)
+
+    texts = []
+    start = time.perf_counter()
+    for audio in audios:
+        text, _ = transcribe_long(audio, transcribe_many, segments=[(0, len(audio))])
+        texts.append(text.strip())
+    return texts, entry.load_seconds, time.perf_counter() - start
+
+
+def run_parity(paths, backends, language=None, baseline="eager"):
+    """
+    Compare backends against the float32 eager baseline on the same clips.
+
+    If a clip has a transcript next to it (same name with a .txt extension),
+    WER against that reference is reported too.
+
+    Returns:
+        Dict with per-backend timing, speedup and WER figures
+    """
+    language = model_registry.normalize_language(language)
+    audios = [load_audio(path) for path in paths]
+    audio_seconds = sum(len(a) for a in audios) / 16000
+
+    references = []
+    for path in paths:
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                references.append(f.read().strip())
+        else:
+            references.append(None)
+    has_references = all(r is not None for r in references)
+
+    # Warm each backend up on the first clip so compilation does not count as inference time
+    results = {}
+    baseline_texts = None
+    for backend in [baseline] + [b for b in backends if b != baseline]:
+        inference.warmup(language=language, backend=backend)
+        texts, load_seconds, seconds = transcribe_all(backend, audios, language)
+        if baseline_texts is None:
+            baseline_texts = texts
+
+        result = {
+            "load_seconds": round(load_seconds, 3),
+            "inference_seconds": round(seconds, 3),
+            "real_time_factor": round(seconds / audio_seconds, 4) if audio_seconds else None,
+            "speedup": round(results[baseline]["inference_seconds"] / seconds, 3) if baseline in results and seconds else 1.0,
+            "wer_vs_baseline": round(wer(baseline_texts, texts), 4),
+            "identical_transcripts": sum(a == b for a, b in zip(baseline_texts, texts)),
+        }
+        if has_references:
+            result["wer_vs_reference"] = round(wer(references, texts), 4)
+        results[backend] = result
+
+    # The batched frontend must produce the extractor's features on the same clips
+    entry = model_registry.get_model(backend=baseline)
+    clips = [audio[:entry.frontend.n_samples] for audio in audios]
+    feature_error = max_feature_error(entry.frontend, entry.processor.feature_extractor, clips)
+
+    return {
+        "files": len(paths),
+        "audio_seconds": round(audio_seconds, 2),
+        "feature_max_abs_error": feature_error,
+        "backends": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that optimized backends transcribe like the float32 baseline")
+    parser.add_argument("audio", help="Audio file, directory of audio files, or manifest (.txt or .jsonl)")
+    parser.add_argument("--backends", default="int8,torchscript",
+                        help=f"Comma-separated backends to compare ({', '.join(BACKENDS)})")
+    parser.add_argument("--language", help="Whisper language code (default: STT_LANGUAGE or jw)")
+    parser.add_argument("--max-wer", type=float, default=0.05,
+                        help="Fail if any backend's WER against the baseline is above this")
+    parser.add_argument("--max-feature-error", type=float, default=1e-3,
+                        help="Fail if the batched log-mel frontend differs from the extractor by more than this")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    paths = [args.audio] if args.audio.lower().endswith(AUDIO_EXTENSIONS) else find_inputs(args.audio)
+    if not paths:
+        print(f"No audio files found in {args.audio}")
+        sys.exit(1)
+
+    report = run_parity(paths, [b.strip() for b in args.backends.split(",") if b.strip()], args.language)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = [name for name, r in report["backends"].items() if r["wer_vs_baseline"] > args.max_wer]
+    if failed:
+        print(f"WER above {args.max_wer} for: {', '.join(failed)}")
+    if report["feature_max_abs_error"] > args.max_feature_error:
+        print(f"Frontend features differ from the extractor by {report['feature_max_abs_error']}")
+        failed.append("frontend")
+    if failed:
+        sys.exit(1)
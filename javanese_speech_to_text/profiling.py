@@ -0,0 +1,162 @@
+import contextlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+# Where traces are written
+PROFILE_DIR = os.environ.get("STT_PROFILE_DIR", "profiles")
+
+# Fraction of calls profiled without being asked to (0.01 profiles 1% of traffic)
+PROFILE_SAMPLE_RATE = float(os.environ.get("STT_PROFILE_SAMPLE_RATE", 0))
+
+# Ops listed in each summary, by self CPU time
+TOP_OPS = 25
+
+# torch.profiler can only record one session per process at a time
+_session_lock = threading.Lock()
+
+# Profile active on the current thread, read by stage()
+_active = threading.local()
+
+
+class Profile:
+    """
+    Record one call under torch.profiler together with Python stage timers.
+
+    On exit two files are written to output_dir: <id>.trace.json, a Chrome
+    trace (open it in chrome://tracing or https://ui.perfetto.dev), and
+    <id>.summary.json with the stage timings and the most expensive ops.
+
+    Only one profile can run in a process at a time. If another one is
+    already running, this one does nothing and skipped is set.
+    """
+
+    def __init__(self, name, output_dir=None, record_shapes=True):
+        self.name = name
+        self.output_dir = output_dir or PROFILE_DIR
+        self.record_shapes = record_shapes
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{uuid.uuid4().hex[:8]}"
+        self.stages = {}
+        self.skipped = False
+        self.trace_path = None
+        self.summary_path = None
+        self.total_seconds = None
+        self._profiler = None
+        self._start = None
+
+    def __enter__(self):
+        if not _session_lock.acquire(blocking=False):
+            self.skipped = True
+            return self
+
+        import torch
+
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        self._profiler = torch.profiler.profile(activities=activities, record_shapes=self.record_shapes)
+        self._profiler.__enter__()
+        _active.profile = self
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.skipped:
+            return False
+        try:
+            self.total_seconds = time.perf_counter() - self._start
+            _active.profile = None
+            self._profiler.__exit__(exc_type, exc, tb)
+            self._write()
+        finally:
+            _session_lock.release()
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a stage and mark it as a named range in the trace."""
+        import torch
+        start = time.perf_counter()
+        with torch.profiler.record_function(name):
+            try:
+                yield
+            finally:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def to_dict(self):
+        if self.skipped:
+            return {"skipped": "Another profile was already running"}
+        return {
+            "id": self.id,
+            "trace": self.trace_path,
+            "summary": self.summary_path,
+            "total_seconds": round(self.total_seconds, 4) if self.total_seconds is not None else None,
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+        }
+
+    def _write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.trace_path = os.path.join(self.output_dir, f"{self.id}.trace.json")
+        self.summary_path = os.path.join(self.output_dir, f"{self.id}.summary.json")
+        self._profiler.export_chrome_trace(self.trace_path)
+
+        averages = sorted(self._profiler.key_averages(), key=lambda e: e.self_cpu_time_total, reverse=True)
+        summary = dict(self.to_dict(), name=self.name, top_ops=[
+            {
+                "op": event.key,
+                "calls": event.count,
+                "self_cpu_ms": round(event.self_cpu_time_total / 1000, 3),
+                "cpu_ms": round(event.cpu_time_total / 1000, 3),
+            }
+            for event in averages[:TOP_OPS]
+        ])
+        with open(self.summary_path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+def stage(name):
+    """
+    Time a stage of the profile running on this thread, if there is one.
+
+    Costs one thread-local lookup when nothing is being profiled.
+    """
+    profile = getattr(_active, "profile", None)
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.stage(name)
+
+
+def record_stages(timings):
+    """Add stage timings measured elsewhere to the profile running on this thread."""
+    profile = getattr(_active, "profile", None)
+    if profile is not None:
+        for name, seconds in timings.items():
+            profile.stages[name] = profile.stages.get(name, 0.0) + seconds
+
+
+def should_sample(rate=None):
+    """Decide whether to profile this call, at rate (defaults to STT_PROFILE_SAMPLE_RATE)."""
+    rate = PROFILE_SAMPLE_RATE if rate is None else rate
+    return rate > 0 and random.random() < rate
+
+
+def maybe_profile(name, enabled=None, rate=None, output_dir=None):
+    """
+    Profile a block when enabled, or for a sampled fraction of calls.
+
+    Args:
+        name: Label used in the file names
+        enabled: True to always profile, False never; None samples at rate
+        rate: Sampling rate when enabled is None (defaults to STT_PROFILE_SAMPLE_RATE)
+
+    Returns:
+        A Profile, or a null context whose value is None
+    """
+    if enabled is None:
+        enabled = should_sample(rate)
+    if not enabled:
+        return contextlib.nullcontext()
+    return Profile(name, output_dir)
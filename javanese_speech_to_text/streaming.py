@@ -0,0 +1,294 @@
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from batching import MAX_BATCH_SECONDS
+
+SAMPLE_RATE = 16000
+
+
+def _frame_rms(audio, frame_length):
+    """RMS energy of consecutive non-overlapping frames."""
+    n_frames = len(audio) // frame_length
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_length].reshape(n_frames, frame_length)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def _common_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return a[:n]
+
+
+class RingBuffer:
+    """
+    Fixed-size buffer of float32 samples between an audio callback and a reader.
+
+    The callback appends with write() and a worker takes everything that
+    arrived since its last read() call. Memory stays at capacity samples however
+    long the stream runs; if the reader falls more than capacity behind, the
+    oldest unread samples are overwritten and counted in dropped.
+    """
+
+    def __init__(self, capacity):
+        """
+        Args:
+            capacity: Number of samples held, e.g. 30 * SAMPLE_RATE for 30 seconds
+        """
+        self.capacity = capacity
+        self.dropped = 0
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._written = 0  # Samples written since the start, including overwritten ones
+        self._read = 0  # Samples handed to the reader or dropped
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def write(self, samples):
+        """Append samples; cheap enough to call from a real-time audio callback."""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        total = len(samples)
+        samples = samples[-self.capacity:]
+        with self._cond:
+            start = (self._written + total - len(samples)) % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self._written += total
+
+            overflow = self._written - self._read - self.capacity
+            if overflow > 0:
+                self.dropped += overflow
+                self._read += overflow
+            self._cond.notify()
+
+    def read(self, timeout=None):
+        """
+        Take all unread samples, waiting up to timeout seconds for some to arrive.
+
+        Returns:
+            1-D float32 array, empty if nothing arrived in time or the buffer is closed
+        """
+        with self._cond:
+            if self._written == self._read and not self._closed:
+                self._cond.wait(timeout)
+            count = self._written - self._read
+            start = self._read % self.capacity
+            first = min(count, self.capacity - start)
+            samples = np.concatenate([self._data[start:start + first], self._data[:count - first]])
+            self._read = self._written
+            return samples
+
+    def close(self):
+        """Wake up a waiting reader; no more writes are expected."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class StreamingSession:
+    """
+    Incremental transcription of an audio stream.
+
+    Audio is appended with push(). Only the unfinalized tail of the stream is
+    kept and re-decoded; once the speaker pauses (or the tail grows past
+    max_tail_s) the tail is finalized into a segment and dropped from the
+    buffer, so decoding cost stays bounded no matter how long the stream runs.
+
+    Between finalizations the words that two consecutive decodes agree on are
+    reported as stable, and the rest of the latest hypothesis as unstable.
+    """
+
+    def __init__(self, transcribe_fn, sample_rate=SAMPLE_RATE, min_decode_interval_s=0.5,
+                 max_tail_s=10.0, pause_s=0.6, silence_rms=0.01, max_decode_s=MAX_BATCH_SECONDS):
+        """
+        Args:
+            transcribe_fn: Callable taking a 16 kHz float32 array and returning text
+            sample_rate: Sample rate of the pushed audio
+            min_decode_interval_s: Minimum new audio between two decodes of the tail
+            max_tail_s: Tail length at which a segment is finalized even without a pause
+            pause_s: Trailing silence that ends a segment
+            silence_rms: Frame RMS below which audio counts as silence
+            max_decode_s: Longest audio passed to transcribe_fn in one call
+        """
+        self.transcribe_fn = transcribe_fn
+        self.sample_rate = sample_rate
+        self.min_decode_samples = int(min_decode_interval_s * sample_rate)
+        self.max_tail_samples = int(max_tail_s * sample_rate)
+        self.max_decode_samples = int(max_decode_s * sample_rate)
+        self.pause_samples = int(pause_s * sample_rate)
+        self.silence_rms = silence_rms
+        self.frame_length = int(0.03 * sample_rate)
+
+        self.tail = np.zeros(0, dtype=np.float32)
+        self.tail_start = 0  # Position of the tail in the stream, in samples
+        self.undecoded = 0  # Samples pushed since the tail was last decoded
+        self.hypothesis = []
+        self.stable = []
+        self.segments = []
+        self.lock = threading.Lock()
+        self.last_active = time.monotonic()
+
+    def push(self, audio):
+        """
+        Append audio to the stream and decode the tail if enough audio arrived.
+
+        Args:
+            audio: 1-D float32 array of new samples
+
+        Returns:
+            Dict with the segments finalized by this call and the current partial text
+        """
+        audio = np.asarray(audio, dtype=np.float32)
+        with self.lock:
+            self.last_active = time.monotonic()
+            finalized = []
+            # A caller that fell behind can push more than the model takes in one call;
+            # feed it in pieces of at most max_tail_s so every tail stays under 30 seconds
+            for offset in range(0, len(audio), self.max_tail_samples):
+                finalized.extend(self._append(audio[offset:offset + self.max_tail_samples]))
+            return self._result(finalized)
+
+    def _append(self, audio):
+        self.tail = np.concatenate([self.tail, audio])
+        self.undecoded += len(audio)
+
+        if len(self.tail) > self.pause_samples and not self._has_speech(self.tail):
+            # Nothing said yet: keep only a short lead-in instead of buffering silence
+            drop = len(self.tail) - self.pause_samples
+            self.tail = self.tail[drop:]
+            self.tail_start += drop
+            self.undecoded = min(self.undecoded, len(self.tail))
+
+        finalized = []
+        if self._ends_with_pause():
+            finalized.extend(self._finalize_all())
+        elif len(self.tail) >= self.max_tail_samples:
+            segment = self._finalize(self._quietest_cut())
+            if segment:
+                finalized.append(segment)
+        elif self.undecoded >= self.min_decode_samples:
+            self._decode_tail()
+        return finalized
+
+    def finish(self):
+        """Finalize whatever is left in the tail and return the full result."""
+        with self.lock:
+            result = self._result(self._finalize_all())
+            result["text"] = " ".join(s["text"] for s in self.segments)
+            return result
+
+    def _result(self, finalized):
+        return {
+            "segments": finalized,
+            "stable": " ".join(self.stable),
+            "unstable": " ".join(self.hypothesis[len(self.stable):]),
+            "partial": " ".join(self.hypothesis),
+        }
+
+    def _has_speech(self, audio):
+        rms = _frame_rms(audio, self.frame_length)
+        return bool(len(rms)) and bool(np.any(rms >= self.silence_rms))
+
+    def _ends_with_pause(self):
+        if len(self.tail) <= self.pause_samples:
+            return False
+        trailing = _frame_rms(self.tail[-self.pause_samples:], self.frame_length)
+        return bool(np.all(trailing < self.silence_rms)) and self._has_speech(self.tail[:-self.pause_samples])
+
+    def _quietest_cut(self):
+        # Cut in the quietest frame of the last quarter of the tail to avoid splitting words
+        search_start = len(self.tail) * 3 // 4
+        rms = _frame_rms(self.tail[search_start:], self.frame_length)
+        if not len(rms):
+            return len(self.tail)
+        return search_start + int(np.argmin(rms)) * self.frame_length + self.frame_length // 2
+
+    def _decode_tail(self):
+        self.undecoded = 0
+        if not self._has_speech(self.tail):
+            self.hypothesis = []
+            self.stable = []
+            return
+        words = self.transcribe_fn(self.tail[:self.max_decode_samples]).split()
+        self.stable = _common_prefix(self.hypothesis, words) if self.hypothesis else []
+        self.hypothesis = words
+
+    def _finalize_all(self):
+        """Finalize the whole tail, at most max_decode_s per transcription call."""
+        finalized = []
+        while len(self.tail):
+            segment = self._finalize(len(self.tail))
+            if segment:
+                finalized.append(segment)
+        return finalized
+
+    def _finalize(self, cut):
+        # Whisper silently drops audio past 30 seconds; the rest stays in the tail for the next call
+        cut = min(cut, self.max_decode_samples)
+        audio = self.tail[:cut]
+        start = self.tail_start
+
+        self.tail = self.tail[cut:]
+        self.tail_start += cut
+        self.undecoded = len(self.tail)
+        self.hypothesis = []
+        self.stable = []
+
+        if not self._has_speech(audio):
+            return None
+        text = self.transcribe_fn(audio).strip()
+        if not text:
+            return None
+
+        segment = {
+            "start": start / self.sample_rate,
+            "end": (start + cut) / self.sample_rate,
+            "text": text,
+        }
+        self.segments.append(segment)
+        return segment
+
+
+class StreamingSessions:
+    """Thread-safe collection of streaming sessions with idle expiry."""
+
+    def __init__(self, transcribe_fn, idle_timeout_s=60.0, **session_kwargs):
+        self.transcribe_fn = transcribe_fn
+        self.idle_timeout_s = idle_timeout_s
+        self.session_kwargs = session_kwargs
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        options = dict(self.session_kwargs, **kwargs)
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            self._sessions[session_id] = StreamingSession(self.transcribe_fn, **options)
+        return session_id
+
+    def get(self, session_id):
+        with self._lock:
+            self._expire()
+            return self._sessions.get(session_id)
+
+    def pop(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [sid for sid, s in self._sessions.items() if now - s.last_active > self.idle_timeout_s]
+        for sid in expired:
+            del self._sessions[sid]
@@ -2,6 +2,17 @@ import requests
 import sys
 import os
 import base64
+import argparse
+import io
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+import soundfile as sf
 
 def test_health_check(api_url):
     """Test the health check endpoint"""
@@ -53,7 +64,263 @@ def test_transcribe_base64(api_url, audio_file_path):
     print(f"Response: {response.json()}")
     print()
 
+# Load testing
+#
+# python test_api.py load [options] drives a local server with many concurrent
+# requests and reports latency percentiles, error rates and throughput.
+
+SAMPLE_RATE = 16000
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1", "0.0.0.0")
+
+PAYLOADS = ("multipart", "base64", "binary")
+
+def synthetic_clip(seconds, rng):
+    """Speech-like bursts (voiced syllables with pauses) so VAD keeps them"""
+    n = int(seconds * SAMPLE_RATE)
+    audio = rng.normal(0, 0.002, n).astype(np.float32)
+    position = int(0.2 * SAMPLE_RATE)
+    while position < n:
+        length = int(rng.uniform(0.15, 0.4) * SAMPLE_RATE)
+        t = np.arange(min(length, n - position)) / SAMPLE_RATE
+        f0 = rng.uniform(100, 220)
+        burst = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 5)) * np.hanning(len(t))
+        audio[position:position + len(t)] += 0.2 * burst.astype(np.float32)
+        position += length + int(rng.uniform(0.05, 0.5) * SAMPLE_RATE)
+    return audio
+
+def load_clips(paths, lengths, seed):
+    """
+    Clips the load test picks from
+    
+    Files (or every audio file in a directory) are decoded once up front;
+    without files, synthetic clips of the given lengths are generated.
+    """
+    clips = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.listdir(path))
+            clips.extend(load_clips([os.path.join(path, n) for n in names if n.lower().endswith((".wav", ".flac", ".ogg"))], (), seed))
+            continue
+        audio, sr = sf.read(path, dtype="float32", always_2d=True)
+        clips.append((audio.mean(axis=1), sr))
+    if not paths:
+        rng = np.random.default_rng(seed)
+        clips = [(synthetic_clip(seconds, rng), SAMPLE_RATE) for seconds in lengths]
+    return clips
+
+class Workload:
+    """
+    Builds request payloads from a mix of clips and payload encodings
+    
+    Each request gets a tiny random dither so payloads are unique and the
+    server's transcription cache does not turn the test into cache hits.
+    """
+    def __init__(self, clips, payloads, unique=True, seed=0):
+        self.clips = clips
+        self.payloads = payloads
+        self.unique = unique
+        self.seed = seed
+        self._local = threading.local()
+    
+    def _rng(self):
+        if not hasattr(self._local, "rng"):
+            self._local.rng = random.Random(f"{self.seed}-{threading.get_ident()}")
+        return self._local.rng
+    
+    def build(self):
+        """Return (requests.post keyword arguments, payload name, audio seconds)"""
+        rng = self._rng()
+        audio, sr = rng.choice(self.clips)
+        if self.unique:
+            noise = np.random.default_rng(rng.getrandbits(32)).normal(0, 1e-4, len(audio))
+            audio = (audio + noise).astype(np.float32)
+        
+        buffer = io.BytesIO()
+        sf.write(buffer, audio, sr, format="WAV", subtype="PCM_16")
+        data = buffer.getvalue()
+        
+        payload = rng.choice(self.payloads)
+        if payload == "multipart":
+            kwargs = {"files": {"audio_file": ("clip.wav", data, "audio/wav")}}
+        elif payload == "base64":
+            kwargs = {"json": {"audio_base64": "data:audio/wav;base64," + base64.b64encode(data).decode("ascii")}}
+        else:
+            kwargs = {"data": data, "headers": {"Content-Type": "audio/wav"}}
+        return kwargs, payload, len(audio) / sr
+
+# One keep-alive session per client thread, so connections are reused
+_sessions = threading.local()
+
+def session():
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session
+
+def send(url, workload, timeout, scheduled=None):
+    """
+    Send one request and time it
+    
+    For open-loop tests, latency counts from the scheduled send time so that
+    requests delayed by a saturated client are not reported as fast.
+    """
+    kwargs, payload, audio_seconds = workload.build()
+    start = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        response = session().post(url, timeout=timeout, **kwargs)
+        status = response.status_code
+        error = None if status == 200 else response.text[:200]
+    except requests.RequestException as e:
+        status, error = None, f"{type(e).__name__}: {e}"
+    return {
+        "status": status,
+        "latency": time.perf_counter() - start,
+        "payload": payload,
+        "audio_seconds": audio_seconds,
+        "error": error,
+    }
+
+def run_closed_loop(url, workload, concurrency, duration, timeout):
+    """Each of concurrency clients sends its next request as soon as the previous one returns"""
+    results = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    
+    def client():
+        while time.perf_counter() < deadline:
+            result = send(url, workload, timeout)
+            with lock:
+                results.append(result)
+    
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+def run_poisson(url, workload, rate, duration, timeout, max_in_flight, seed=0):
+    """Send requests with exponentially distributed gaps (Poisson arrivals) at rate per second"""
+    rng = random.Random(seed)
+    futures = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_in_flight) as executor:
+        scheduled = start
+        while True:
+            scheduled += rng.expovariate(rate)
+            if scheduled - start >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(send, url, workload, timeout, scheduled))
+    results = [f.result() for f in futures]
+    return results, time.perf_counter() - start
+
+def summarize(results, elapsed, offered=None):
+    """Latency percentiles, error and rejection rates and throughput of one load level"""
+    total = len(results)
+    ok = [r for r in results if r["status"] == 200]
+    rejected = [r for r in results if r["status"] in (429, 503)]
+    errors = total - len(ok) - len(rejected)
+    latencies = np.array([r["latency"] for r in ok]) * 1000
+    
+    summary = {
+        "offered": offered,
+        "requests": total,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "audio_seconds_per_s": round(sum(r["audio_seconds"] for r in ok) / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rejected_rate": round(len(rejected) / total, 4) if total else 0.0,
+        "status_counts": {},
+        "payload_counts": {},
+    }
+    for r in results:
+        status = str(r["status"]) if r["status"] is not None else "connection_error"
+        summary["status_counts"][status] = summary["status_counts"].get(status, 0) + 1
+        summary["payload_counts"][r["payload"]] = summary["payload_counts"].get(r["payload"], 0) + 1
+    if len(latencies):
+        for q in (50, 90, 95, 99):
+            summary[f"p{q}_ms"] = round(float(np.percentile(latencies, q)), 1)
+        summary["max_ms"] = round(float(latencies.max()), 1)
+    errors_seen = [r["error"] for r in results if r["error"] and r["status"] not in (429, 503)]
+    if errors_seen:
+        summary["sample_error"] = errors_seen[0]
+    return summary
+
+def print_summary(summary, label):
+    latency = " ".join(f"p{q}={summary.get(f'p{q}_ms', '-')}ms" for q in (50, 90, 95, 99))
+    print(f"{label:>14}: {summary['throughput_rps']:.2f} req/s ok, {summary['audio_seconds_per_s']:.1f} audio s/s, "
+          f"{latency}, errors {summary['error_rate']:.1%}, rejected (429/503) {summary['rejected_rate']:.1%}")
+
+def load_test(argv):
+    parser = argparse.ArgumentParser(prog="test_api.py load", description="Load test a local Javanese STT API")
+    parser.add_argument("audio", nargs="*", help="Audio files or directories (default: synthetic clips)")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--mode", choices=("closed", "poisson"), default="closed")
+    parser.add_argument("--concurrency", default="1,4,8",
+                        help="Closed loop: comma-separated numbers of concurrent clients to step through")
+    parser.add_argument("--rates", default="1,2,4",
+                        help="Poisson: comma-separated arrival rates (requests per second) to step through")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per load level")
+    parser.add_argument("--lengths", default="2,5,10,30",
+                        help="Synthetic clip lengths in seconds, picked uniformly")
+    parser.add_argument("--payload", default="mixed", help=f"One of {', '.join(PAYLOADS)} or 'mixed'")
+    parser.add_argument("--no-unique", action="store_true", help="Send identical payloads (measures cache hits)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Poisson: client-side request limit")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--allow-remote", action="store_true", help="Allow a non-local --url")
+    args = parser.parse_args(argv)
+    
+    if urlparse(args.url).hostname not in LOCAL_HOSTS and not args.allow_remote:
+        parser.error(f"{args.url} is not a local server; pass --allow-remote to load test it anyway")
+    if args.payload != "mixed" and args.payload not in PAYLOADS:
+        parser.error(f"--payload must be one of {', '.join(PAYLOADS)} or 'mixed'")
+    
+    clips = load_clips(args.audio, [float(x) for x in args.lengths.split(",")], args.seed)
+    if not clips:
+        parser.error("No audio clips to send")
+    workload = Workload(clips, PAYLOADS if args.payload == "mixed" else (args.payload,), not args.no_unique, args.seed)
+    url = f"{args.url.rstrip('/')}/transcribe"
+    
+    levels = []
+    if args.mode == "closed":
+        for concurrency in [int(x) for x in args.concurrency.split(",")]:
+            results, elapsed = run_closed_loop(url, workload, concurrency, args.duration, args.timeout)
+            summary = summarize(results, elapsed, {"concurrency": concurrency})
+            print_summary(summary, f"{concurrency} clients")
+            levels.append(summary)
+    else:
+        for rate in [float(x) for x in args.rates.split(",")]:
+            results, elapsed = run_poisson(url, workload, rate, args.duration, args.timeout, args.max_in_flight, args.seed)
+            summary = summarize(results, elapsed, {"rate_rps": rate})
+            print_summary(summary, f"{rate:g} req/s")
+            levels.append(summary)
+    
+    report = {
+        "url": url,
+        "mode": args.mode,
+        "duration_s": args.duration,
+        "clips": len(clips),
+        "clip_seconds": [round(len(audio) / sr, 2) for audio, sr in clips],
+        "payloads": list(workload.payloads),
+        "unique_payloads": workload.unique,
+        "levels": levels,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "load":
+        load_test(sys.argv[2:])
+        sys.exit(0)
+    
     api_url = "http://localhost:5000"
     
     # Test health check
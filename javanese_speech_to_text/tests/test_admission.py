@@ -0,0 +1,14 @@
+import model_registry
+from admission import AdmissionController
+
+
+def test_degraded_model_follows_swaps(monkeypatch):
+    monkeypatch.setitem(model_registry._active_versions, "fast", "/models/fast/v1")
+    controller = AdmissionController(batcher=None, degraded_model="fast")
+    assert controller.degraded_settings()[0] == "/models/fast/v1"
+
+    # What swap() does once the new version is warmed up
+    monkeypatch.setitem(model_registry._active_versions, "fast", "/models/fast/v2")
+    assert controller.degraded_settings()[0] == "/models/fast/v2"
+    # A model the client asked for is kept
+    assert controller.degraded_settings("/models/other")[0] == "/models/other"
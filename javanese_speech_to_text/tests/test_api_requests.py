@@ -0,0 +1,43 @@
+import pytest
+
+import api
+
+
+@pytest.mark.parametrize("body", ["", "{not json", "[1, 2]", '{"audio": "x"}', '{"audio_base64": 5}'])
+@pytest.mark.parametrize("url", ["/transcribe", "/jobs"])
+def test_malformed_json_body_is_rejected_with_400(url, body):
+    response = api.app.test_client().post(url, data=body, content_type="application/json")
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+@pytest.mark.parametrize("headers", [
+    {"X-Sample-Rate": "0"},
+    {"X-Sample-Rate": "-16000"},
+    {"X-Sample-Rate": "fast"},
+    {"X-Channels": "two"},
+    {"X-Channels": "0"},
+])
+def test_bad_pcm_headers_are_rejected_with_400(headers):
+    response = api.app.test_client().post("/transcribe", data=b"\0" * 3200, content_type="audio/pcm", headers=headers)
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"data": b"", "content_type": "audio/wav"}])
+def test_missing_or_empty_audio_is_rejected_with_400(kwargs):
+    response = api.app.test_client().post("/transcribe", **kwargs)
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+@pytest.mark.parametrize("deadline", ["nan", "inf", "-inf", "-5"])
+def test_invalid_deadline_is_rejected_with_400(deadline):
+    response = api.app.test_client().post("/transcribe", data=b"\0" * 3200, content_type="audio/pcm",
+                                          headers={"X-Deadline-Ms": deadline})
+
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
@@ -0,0 +1,58 @@
+import threading
+
+import soundfile as sf
+
+import batch_transcribe
+from batching import CancelledError
+from benchmark import synthetic_speech
+
+
+def write_clip(path, seconds, seed):
+    sf.write(str(path), synthetic_speech(seconds, seed), 16000)
+    return str(path)
+
+
+def test_failed_batch_only_fails_its_files(tmp_path):
+    good = [write_clip(tmp_path / f"good_{i}.wav", 8, seed=i) for i in range(3)]
+    # Long enough to become several overlapping windows, each over 25 seconds
+    bad = write_clip(tmp_path / "bad.wav", 50, seed=10)
+
+    def transcribe_fn(audios, max_new_tokens):
+        if any(len(audio) > 25 * 16000 for audio in audios):
+            raise RuntimeError("boom")
+        return ["halo"] * len(audios)
+
+    records = []
+    summary = batch_transcribe.run(
+        good + [bad], None, batch_size=1, decode_workers=2, transcribe_fn=transcribe_fn,
+        log=lambda message: None, on_record=records.append,
+    )
+
+    by_path = {record["path"]: record for record in records}
+    assert len(records) == 4
+    assert by_path[bad]["status"] == "error"
+    assert by_path[bad]["error"] == "boom"
+    for path in good:
+        assert by_path[path]["status"] == "ok"
+        assert by_path[path]["transcription"]
+    assert summary["ok"] == 3
+    assert summary["errors"] == 1
+
+
+def test_cancelled_batch_is_reported_as_cancelled_not_failed(tmp_path):
+    paths = [write_clip(tmp_path / f"clip_{i}.wav", 8, seed=i) for i in range(3)]
+    cancel_event = threading.Event()
+
+    def transcribe_fn(audios, max_new_tokens):
+        # Cancel arrives while the batch is running, as with transcribe_batch's stopping criteria
+        cancel_event.set()
+        raise CancelledError("Transcription was cancelled")
+
+    records = []
+    summary = batch_transcribe.run(
+        paths, None, batch_size=1, transcribe_fn=transcribe_fn, log=lambda message: None,
+        on_record=records.append, cancel_event=cancel_event,
+    )
+
+    assert summary["cancelled"] is True
+    assert records == []
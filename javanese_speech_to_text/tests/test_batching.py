@@ -0,0 +1,59 @@
+import threading
+import time
+
+import numpy as np
+
+from batching import CancelledError, MicroBatcher
+
+
+class CancelledAfterFirstCheck:
+    """
+    Event that is set right after the batcher thread first looks at it, i.e. the
+    request is cancelled while its batch is being sorted out.
+    """
+
+    def __init__(self):
+        self.batcher_checks = 0
+
+    def is_set(self):
+        if threading.current_thread().name.startswith("micro-batcher"):
+            self.batcher_checks += 1
+        return self.batcher_checks > 1
+
+
+def submit_all(batcher, cancel_events):
+    outcomes = [None] * len(cancel_events)
+
+    def submit(i):
+        try:
+            outcomes[i] = batcher.submit(np.zeros(16000, dtype=np.float32), timeout=5,
+                                         cancel_event=cancel_events[i])[0]
+        except CancelledError:
+            outcomes[i] = "cancelled"
+        except TimeoutError:
+            outcomes[i] = "timeout"
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(cancel_events))]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def test_pending_seconds_returns_to_zero_after_cancels_during_collection():
+    batcher = MicroBatcher(max_batch_size=16, max_wait_ms=200,
+                           runner=lambda audios, language, max_new_tokens: ["halo"] * len(audios))
+    events = [threading.Event() for _ in range(4)] + [CancelledAfterFirstCheck() for _ in range(4)]
+    threads, outcomes = submit_all(batcher, events)
+
+    # Cancel half of the plain events while the batcher is still collecting
+    time.sleep(0.05)
+    for event in events[:2]:
+        event.set()
+    for thread in threads:
+        thread.join()
+
+    assert "timeout" not in outcomes
+    assert outcomes[:2] == ["cancelled", "cancelled"]
+    assert outcomes[2:4] == ["halo", "halo"]
+    assert batcher.pending_seconds() == 0
+    assert batcher.stats()["requests"] + batcher.stats()["cancelled"] == len(events)
@@ -0,0 +1,20 @@
+from benchmark import synthetic_speech
+from streaming import StreamingSession
+
+
+def test_backlog_is_transcribed_in_pieces_of_at_most_30_seconds():
+    lengths = []
+
+    def transcribe(audio):
+        lengths.append(len(audio))
+        return "halo"
+
+    # One push of a long backlog, as when transcription fell behind the microphone
+    session = StreamingSession(transcribe, max_tail_s=40.0, pause_s=5.0)
+    audio = synthetic_speech(75, seed=0)
+    session.push(audio)
+    session.finish()
+
+    assert lengths
+    assert max(lengths) <= 30 * 16000
+    assert session.segments[-1]["end"] == len(audio) / 16000
@@ -0,0 +1,18 @@
+import numpy as np
+
+from benchmark import synthetic_speech
+from vad import detect_speech
+
+
+def test_quiet_speech_is_detected():
+    # Voiced frames peak around -36 and -42 dBFS, well above min_energy_db but below -35
+    for gain in (0.1, 0.05):
+        audio = (synthetic_speech(5, seed=0) * gain).astype(np.float32)
+
+        assert detect_speech(audio) != []
+
+
+def test_silence_is_not_speech():
+    audio = np.random.default_rng(0).normal(0, 0.002, 5 * 16000).astype(np.float32)
+
+    assert detect_speech(audio) == []
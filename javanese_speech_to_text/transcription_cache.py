@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from batching import CancelledError
+
+
+class TranscriptionCache:
+    """
+    Cache of transcription results keyed by the decoded audio and generation settings.
+
+    Lookups go through an in-memory LRU first and then an optional on-disk
+    tier. Requests for a key that is already being computed wait for that
+    computation instead of starting their own.
+    """
+
+    def __init__(self, max_entries=1024, disk_dir=None, disk_ttl_s=7 * 24 * 3600,
+                 disk_max_bytes=256 * 1024 * 1024):
+        """
+        Args:
+            max_entries: Size of the in-memory LRU (0 disables caching entirely)
+            disk_dir: Directory for the on-disk tier, None to keep everything in memory
+            disk_ttl_s: Age after which on-disk entries are ignored and removed
+            disk_max_bytes: Total size above which the oldest on-disk entries are removed
+        """
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_ttl_s = disk_ttl_s
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = None
+        self._counts = {"hit": 0, "disk_hit": 0, "miss": 0, "coalesced": 0}
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """Create a cache configured from STT_CACHE_SIZE, STT_CACHE_DIR, STT_CACHE_TTL_S and STT_CACHE_MAX_BYTES."""
+        return cls(
+            max_entries=int(os.environ.get("STT_CACHE_SIZE", 1024)),
+            disk_dir=os.environ.get("STT_CACHE_DIR") or None,
+            disk_ttl_s=float(os.environ.get("STT_CACHE_TTL_S", 7 * 24 * 3600)),
+            disk_max_bytes=int(os.environ.get("STT_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+        )
+
+    @staticmethod
+    def make_key(audio, **settings):
+        """
+        Hash decoded audio together with the settings that affect the result.
+
+        Args:
+            audio: Decoded float32 samples
+            settings: Model ID, language, token budget, ... as keyword arguments
+
+        Returns:
+            Hex digest identifying the transcription
+        """
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(audio, dtype=np.float32).data)
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def contains(self, key):
+        """Whether key is in memory or being computed, i.e. get_or_compute() would not start new work."""
+        with self._lock:
+            return key in self._memory or key in self._in_flight
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for key, computing it at most once.
+
+        Args:
+            key: Key from make_key()
+            compute: Callable producing the JSON-serializable result on a miss
+
+        Returns:
+            Tuple of (result, status) where status is "hit", "disk_hit", "miss" or "coalesced"
+        """
+        if self.max_entries <= 0:
+            return compute(), "miss"
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counts["hit"] += 1
+                return self._memory[key], "hit"
+
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._counts["coalesced"] += 1
+
+        if not leader:
+            try:
+                return future.result(), "coalesced"
+            except CancelledError:
+                # The request doing the work was abandoned by its client; this one still wants the result
+                return self.get_or_compute(key, compute)
+
+        try:
+            value = self._read_disk(key)
+            status = "disk_hit"
+            if value is None:
+                value = compute()
+                status = "miss"
+                self._write_disk(key, value)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            self._counts[status] += 1
+            self._memory[key] = value
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        future.set_result(value)
+        return value, status
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats["entries"] = len(self._memory)
+            stats["in_flight"] = len(self._in_flight)
+        stats["disk_bytes"] = self._disk_bytes or 0
+        return stats
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.disk_ttl_s:
+                self._remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"value": value}).encode("utf-8")
+
+        # Write to a temporary name first so readers never see a partial entry
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._prune()
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _prune(self):
+        # Drop expired entries, then the oldest ones until under 90% of the cap
+        now = time.time()
+        entries = sorted(self._disk_entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, mtime in entries:
+            if total <= self.disk_max_bytes * 0.9 and now - mtime <= self.disk_ttl_s:
+                continue
+            self._remove(path)
+            total -= size
+        self._disk_bytes = total
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
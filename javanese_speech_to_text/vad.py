@@ -0,0 +1,169 @@
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Whisper encodes at most 30 seconds at a time
+MAX_CHUNK_SECONDS = 30
+
+
+def frame_features(audio, sampling_rate=SAMPLE_RATE, frame_ms=30):
+    """
+    Per-frame energy and spectral flatness over non-overlapping frames.
+
+    Args:
+        audio: 1-D float32 array
+        sampling_rate: Sample rate of audio
+        frame_ms: Frame length in milliseconds
+
+    Returns:
+        Tuple of (energy in dBFS, spectral flatness in [0, 1], frame length in samples)
+    """
+    frame_length = int(sampling_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame_length
+    if n_frames == 0:
+        return np.zeros(0), np.zeros(0), frame_length
+
+    frames = np.asarray(audio[:n_frames * frame_length], dtype=np.float32).reshape(n_frames, frame_length)
+    energy = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+    # Flatness is close to 1 for noise-like frames and low for voiced speech
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame_length), axis=1)) ** 2 + 1e-10
+    flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+    return energy, flatness, frame_length
+
+
+def detect_speech(audio, sampling_rate=SAMPLE_RATE, min_energy_db=-45.0, margin_db=10.0,
+                  max_flatness=0.5, min_speech_s=0.2, min_silence_s=0.3, pad_s=0.15):
+    """
+    Find regions of speech in a recording.
+
+    A frame counts as speech when it is margin_db above the noise floor (and
+    above min_energy_db), unless it is both quiet-ish and spectrally flat like
+    stationary noise. Short gaps are bridged, short blips dropped, and each
+    region is padded so word onsets and endings are kept.
+
+    Args:
+        audio: 1-D float32 array
+        sampling_rate: Sample rate of audio
+
+    Returns:
+        List of (start, end) sample indices into audio
+    """
+    energy, flatness, frame_length = frame_features(audio, sampling_rate)
+    if len(energy) == 0:
+        return []
+
+    threshold = max(np.percentile(energy, 10) + margin_db, min_energy_db)
+    loud = energy > threshold
+    noise_like = (flatness > max_flatness) & (energy < threshold + 2 * margin_db)
+    speech = loud & ~noise_like
+
+    # Run boundaries of the speech mask
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    min_gap = int(np.ceil(min_silence_s * sampling_rate / frame_length))
+    min_len = int(np.ceil(min_speech_s * sampling_rate / frame_length))
+    pad = int(pad_s * sampling_rate)
+
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < min_gap:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    segments = []
+    for start, end in regions:
+        if end - start < min_len:
+            continue
+        start = max(0, int(start) * frame_length - pad)
+        end = min(len(audio), int(end) * frame_length + pad)
+        if segments and start <= segments[-1][1]:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
+
+
+def is_silent(audio, sampling_rate=SAMPLE_RATE):
+    """Return True when a recording contains no detectable speech."""
+    return not detect_speech(audio, sampling_rate)
+
+
+class SpeechChunk:
+    """
+    Speech regions packed back to back into one model input.
+
+    spans holds (chunk_offset, original_start, length) triples in samples, so
+    positions inside the chunk can be mapped back to the original recording.
+    """
+
+    def __init__(self, audio, spans, sampling_rate=SAMPLE_RATE):
+        self.audio = audio
+        self.spans = spans
+        self.sampling_rate = sampling_rate
+
+    def to_original_time(self, seconds):
+        """Map a time within the chunk to the time in the original recording."""
+        position = int(seconds * self.sampling_rate)
+        for offset, original_start, length in self.spans:
+            if position < offset + length:
+                return (original_start + max(0, position - offset)) / self.sampling_rate
+        offset, original_start, length = self.spans[-1]
+        return (original_start + length) / self.sampling_rate
+
+    @property
+    def start(self):
+        return self.spans[0][1] / self.sampling_rate
+
+    @property
+    def end(self):
+        offset, original_start, length = self.spans[-1]
+        return (original_start + length) / self.sampling_rate
+
+
+def pack_segments(audio, segments, sampling_rate=SAMPLE_RATE, max_chunk_s=MAX_CHUNK_SECONDS, gap_s=0.1):
+    """
+    Pack speech segments into as few model-sized chunks as possible.
+
+    Segments are joined in order with a short silence between them; segments
+    longer than a chunk are split.
+
+    Args:
+        audio: The original recording
+        segments: (start, end) sample indices from detect_speech()
+        max_chunk_s: Maximum chunk length in seconds
+        gap_s: Silence inserted between joined segments
+
+    Returns:
+        List of SpeechChunk
+    """
+    max_len = int(max_chunk_s * sampling_rate)
+    gap = np.zeros(int(gap_s * sampling_rate), dtype=np.float32)
+
+    # Split overly long segments first
+    pieces = []
+    for start, end in segments:
+        for piece_start in range(start, end, max_len):
+            pieces.append((piece_start, min(end, piece_start + max_len)))
+
+    chunks = []
+    parts, spans, length = [], [], 0
+    for start, end in pieces:
+        needed = (end - start) + (len(gap) if parts else 0)
+        if parts and length + needed > max_len:
+            chunks.append(SpeechChunk(np.concatenate(parts), spans, sampling_rate))
+            parts, spans, length = [], [], 0
+        if parts:
+            parts.append(gap)
+            length += len(gap)
+        parts.append(np.asarray(audio[start:end], dtype=np.float32))
+        spans.append((length, start, end - start))
+        length += end - start
+    if parts:
+        chunks.append(SpeechChunk(np.concatenate(parts), spans, sampling_rate))
+    return chunks
+
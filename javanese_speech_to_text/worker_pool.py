@@ -0,0 +1,257 @@
+import multiprocessing as mp
+import os
+import threading
+import time
+
+import metrics
+import model_registry
+
+
+class WorkerCrashedError(Exception):
+    """Raised when an inference worker died and the retry failed as well."""
+
+
+def _worker_main(conn, model_id, num_threads, language):
+    import torch
+    from inference import transcribe_batch, warmup
+
+    # Pin torch to this worker's share of the cores so workers don't oversubscribe them
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed in this process (inherited from the parent)
+        pass
+
+    # With forkserver or spawn the weights are memory-mapped from the same
+    # safetensors file; with fork they are inherited copy-on-write.
+    entry = warmup(model_id, language=language)
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        op = message[0]
+        if op == "stop":
+            break
+        if op == "ping":
+            conn.send(("ok", None))
+        elif op == "transcribe":
+            _, audios, language, max_new_tokens = message
+            try:
+                # Stage timings go back with the texts so the parent can export them
+                timings = {}
+                texts = transcribe_batch(entry, audios, language, max_new_tokens, timings=timings)
+                conn.send(("ok", (texts, timings)))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.busy = False
+
+
+class WorkerPool:
+    """
+    Pool of inference processes, each running batches on its own cores.
+
+    Workers are started with forkserver (spawn where it is not available):
+    forking the API process itself is unsafe once it runs threads or has used
+    torch's OpenMP pools. fork can still be requested for a single-threaded
+    parent, in which case the model is loaded there first and shared
+    copy-on-write; restarts always use the safe method. A monitor thread pings
+    idle workers and replaces any that died or stopped answering, and a batch
+    that takes longer than batch_timeout_s is treated as a crash.
+    """
+
+    def __init__(self, num_workers, threads_per_worker=None, model_id=None, language=None,
+                 health_interval_s=5.0, ping_timeout_s=10.0, start_timeout_s=300.0, batch_timeout_s=120.0,
+                 start_method=None):
+        """
+        Args:
+            num_workers: Number of inference processes
+            threads_per_worker: Torch intra-op threads per worker (defaults to an even share of the cores)
+            model_id: Model each worker serves
+            language: Language used to warm up the workers
+            health_interval_s: Seconds between health checks
+            ping_timeout_s: How long an idle worker may take to answer a ping
+            start_timeout_s: How long a worker may take to load and warm up
+            batch_timeout_s: How long a worker may take for one batch before it is
+                killed and restarted
+            start_method: multiprocessing start method for the first workers (defaults
+                to forkserver where available, otherwise spawn); "fork" is only used if
+                no other thread is running yet
+        """
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        self.model_id = model_id
+        self.language = language
+        self.health_interval_s = health_interval_s
+        self.ping_timeout_s = ping_timeout_s
+        self.start_timeout_s = start_timeout_s
+        self.batch_timeout_s = batch_timeout_s
+
+        safe_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        self.start_method = start_method or safe_method
+        # Restarts happen from the monitor thread of a multithreaded parent, so never fork
+        self._restart_context = mp.get_context(safe_method)
+        self._context = self._restart_context
+
+        self._workers = []
+        self._idle = threading.Condition()
+        self._monitor = None
+        self._closed = False
+        self.restarts = 0
+
+    def start(self):
+        """Start the workers and wait until each has loaded the model."""
+        if self.start_method == "fork" and threading.active_count() > 1:
+            # A child forked while other threads hold locks can deadlock
+            self.start_method = self._restart_context.get_start_method()
+        if self.start_method == "fork":
+            # Load in the parent only (no inference) so children inherit the weights
+            model_registry.get_model(self.model_id)
+        self._context = mp.get_context(self.start_method)
+
+        self._workers = [self._spawn(i) for i in range(self.num_workers)]
+        for worker in self._workers:
+            self._wait_ready(worker)
+
+        self._monitor = threading.Thread(target=self._monitor_loop, name="worker-pool-monitor", daemon=True)
+        self._monitor.start()
+        return self
+
+    def transcribe(self, audios, language, max_new_tokens=128):
+        """
+        Run one batch on an idle worker.
+
+        Signature matches MicroBatcher's runner, so a batcher with
+        concurrency=num_workers keeps every worker busy.
+
+        Returns:
+            List of transcribed texts
+        """
+        for attempt in range(2):
+            worker = self._acquire()
+            try:
+                worker.conn.send(("transcribe", audios, language, max_new_tokens))
+                if not worker.conn.poll(self.batch_timeout_s):
+                    # Hung in generate: the monitor skips busy workers, so replace it here
+                    self._restart(worker)
+                    raise WorkerCrashedError(f"Inference worker did not finish a batch within {self.batch_timeout_s:g}s")
+                status, payload = worker.conn.recv()
+            except (EOFError, OSError, BrokenPipeError):
+                # Worker died mid-request: replace it and retry once elsewhere
+                self._restart(worker)
+                if attempt == 1:
+                    raise WorkerCrashedError("Inference worker crashed while transcribing")
+                continue
+            finally:
+                self._release(worker)
+
+            if status == "error":
+                raise RuntimeError(payload)
+            texts, timings = payload
+            metrics.observe_stages(timings)
+            return texts
+
+    def stats(self):
+        with self._idle:
+            return {
+                "workers": self.num_workers,
+                "threads_per_worker": self.threads_per_worker,
+                "start_method": self.start_method,
+                "alive": sum(1 for w in self._workers if w.process.is_alive()),
+                "busy": sum(1 for w in self._workers if w.busy),
+                "restarts": self.restarts,
+            }
+
+    def shutdown(self):
+        self._closed = True
+        for worker in self._workers:
+            try:
+                worker.conn.send(("stop",))
+            except (OSError, BrokenPipeError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.kill()
+
+    def _spawn(self, index):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.model_id, self.threads_per_worker, self.language),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(index, process, parent_conn)
+
+    def _wait_ready(self, worker):
+        if not worker.conn.poll(self.start_timeout_s):
+            raise RuntimeError(f"Inference worker {worker.index} did not start in time")
+        status, _ = worker.conn.recv()
+        if status != "ready":
+            raise RuntimeError(f"Inference worker {worker.index} failed to start")
+
+    def _acquire(self):
+        with self._idle:
+            while True:
+                for worker in self._workers:
+                    if not worker.busy and worker.process.is_alive():
+                        worker.busy = True
+                        return worker
+                self._idle.wait()
+
+    def _release(self, worker):
+        with self._idle:
+            worker.busy = False
+            self._idle.notify()
+
+    def _restart(self, worker):
+        if self._closed:
+            return
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=5)
+        self._context = self._restart_context
+        replacement = self._spawn(worker.index)
+        self._wait_ready(replacement)
+        with self._idle:
+            self._workers[worker.index] = replacement
+            self.restarts += 1
+            self._idle.notify_all()
+
+    def _monitor_loop(self):
+        while not self._closed:
+            time.sleep(self.health_interval_s)
+            for worker in list(self._workers):
+                with self._idle:
+                    # Busy workers are checked by the request using them
+                    if worker.busy:
+                        continue
+                    # Take idle workers out of rotation while pinging them
+                    worker.busy = True
+                healthy = worker.process.is_alive()
+                if healthy:
+                    try:
+                        worker.conn.send(("ping",))
+                        healthy = worker.conn.poll(self.ping_timeout_s) and worker.conn.recv()[0] == "ok"
+                    except (EOFError, OSError, BrokenPipeError):
+                        healthy = False
+                if not healthy:
+                    try:
+                        self._restart(worker)
+                    except RuntimeError:
+                        pass
+                self._release(worker)
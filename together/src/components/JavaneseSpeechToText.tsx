@@ -88,42 +88,34 @@ export default function JavaneseSpeechToText({
   const handleAudioData = async () => {
     try {
       setIsProcessing(true);
-      const audioBlob = new Blob(audioChunksRef.current, { type: 'audio/wav' });
-
-      // Convert blob to base64
-      const reader = new FileReader();
-      reader.readAsDataURL(audioBlob);
-      reader.onloadend = async () => {
-        const base64Audio = reader.result as string;
-
-        // Send to API
-        const response = await fetch(apiUrl, {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({
-            audio_base64: base64Audio,
-          }),
-        });
-
-        const data = await response.json();
-
-        if (data.success) {
-          setTranscription(data.transcription);
-          if (onTranscriptionComplete) {
-            onTranscriptionComplete(data.transcription);
-          }
-          // Auto-translate after transcription
-          await translateToEnglish(data.transcription);
-        } else {
-          setError(data.error || 'Failed to transcribe audio');
+      const mimeType = mediaRecorderRef.current?.mimeType || 'application/octet-stream';
+      const audioBlob = new Blob(audioChunksRef.current, { type: mimeType });
+
+      // Send the recording as the raw request body; the API decodes it by content type
+      const response = await fetch(apiUrl, {
+        method: 'POST',
+        headers: {
+          'Content-Type': mimeType,
+        },
+        body: audioBlob,
+      });
+
+      const data = await response.json();
+
+      if (data.success) {
+        setTranscription(data.transcription);
+        if (onTranscriptionComplete) {
+          onTranscriptionComplete(data.transcription);
         }
-        setIsProcessing(false);
-      };
+        // Auto-translate after transcription
+        await translateToEnglish(data.transcription);
+      } else {
+        setError(data.error || 'Failed to transcribe audio');
+      }
     } catch (err) {
       console.error('Error processing audio:', err);
       setError('Error processing audio. Please try again.');
+    } finally {
       setIsProcessing(false);
     }
   };